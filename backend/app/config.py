@@ -17,3 +17,130 @@ DATABASE_URL = os.getenv("DATABASE_CONNECTION")
 BLANDAI_API_KEY = os.getenv("BLANDAI_API_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+
+# Background ingestion
+INGESTION_QUEUE_BACKEND = os.getenv("INGESTION_QUEUE_BACKEND", "local")
+INGESTION_QUEUE_MAXSIZE = int(os.getenv("INGESTION_QUEUE_MAXSIZE", "100"))
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_JOB_RETENTION = int(os.getenv("INGESTION_JOB_RETENTION", "1000"))
+# Job status is mirrored to the database so any web worker can report it. Unfinished jobs whose
+# worker has not written a heartbeat for INGESTION_JOB_STALE_SECONDS are marked failed.
+INGESTION_JOB_SYNC_SECONDS = float(os.getenv("INGESTION_JOB_SYNC_SECONDS", "5"))
+INGESTION_JOB_STALE_SECONDS = float(os.getenv("INGESTION_JOB_STALE_SECONDS", "60"))
+
+# Streaming uploads
+UPLOAD_SPOOL_CHUNK_SIZE = int(os.getenv("UPLOAD_SPOOL_CHUNK_SIZE", str(1024 * 1024)))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024)))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+
+# PDF parsing
+# Every web worker (WEB_CONCURRENCY, as read by uvicorn/gunicorn) starts its own parse pool, so by
+# default the CPUs are split between them instead of each pool taking all of them.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, WEB_CONCURRENCY)))))
+PDF_PAGE_BATCH_SIZE = int(os.getenv("PDF_PAGE_BATCH_SIZE", "8"))
+
+# Embedding cache
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+
+# Pinecone upserts
+PINECONE_UPSERT_CONCURRENCY = int(os.getenv("PINECONE_UPSERT_CONCURRENCY", "8"))
+PINECONE_UPSERT_BATCH_SIZE = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "200"))
+PINECONE_UPSERT_MAX_BATCH_BYTES = int(os.getenv("PINECONE_UPSERT_MAX_BATCH_BYTES", str(1800 * 1024)))
+PINECONE_UPSERT_MAX_RETRIES = int(os.getenv("PINECONE_UPSERT_MAX_RETRIES", "3"))
+
+# Streaming ingestion pipeline
+PDF_PARSE_PREFETCH = int(os.getenv("PDF_PARSE_PREFETCH", str(2 * PDF_PARSE_WORKERS)))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+INGESTION_PIPELINE_QUEUE_SIZE = int(os.getenv("INGESTION_PIPELINE_QUEUE_SIZE", "256"))
+
+# OpenAI embedding executor
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "20000"))
+EMBEDDING_MAX_BATCH_INPUTS = int(os.getenv("EMBEDDING_MAX_BATCH_INPUTS", "2048"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30"))
+
+# Embedding backend: "openai" or "local" (model2vec static model on CPU).
+# Each backend writes to its own Pinecone index because the vector dimensions differ.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "minishlab/potion-base-8M")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "document-rag-local" if EMBEDDING_BACKEND == "local" else "document-rag")
+
+# Worker warmup: readiness (/ready) flips once models, clients and connections are primed.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "60"))
+
+# Hot-document vector cache: answers top-k for recently queried documents in memory.
+VECTOR_CACHE_ENABLED = os.getenv("VECTOR_CACHE_ENABLED", "true").lower() == "true"
+VECTOR_CACHE_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Answer cache for generate-response (exact match on the normalized question)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+# Semantic answer cache: reuses answers for questions within a cosine threshold of an answered one
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(ANSWER_CACHE_TTL_SECONDS)))
+SEMANTIC_CACHE_MAX_PER_DOCUMENT = int(os.getenv("SEMANTIC_CACHE_MAX_PER_DOCUMENT", "256"))
+SEMANTIC_CACHE_MAX_DOCUMENTS = int(os.getenv("SEMANTIC_CACHE_MAX_DOCUMENTS", "1000"))
+
+# Jina reranker client: per-attempt timeout, overall deadline before falling back to vector order
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "16"))
+RERANK_TIMEOUT_SECONDS = float(os.getenv("RERANK_TIMEOUT_SECONDS", "2.0"))
+RERANK_DEADLINE_SECONDS = float(os.getenv("RERANK_DEADLINE_SECONDS", "3.0"))
+RERANK_MAX_RETRIES = int(os.getenv("RERANK_MAX_RETRIES", "2"))
+
+# Reranker backend: "jina" (API), "bm25" (lexical, in-process) or "static" (model2vec similarity, in-process)
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "jina")
+
+# Hybrid retrieval: per-document BM25 index fused with dense results by reciprocal-rank fusion
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_INDEX_CACHE_SIZE = int(os.getenv("BM25_INDEX_CACHE_SIZE", "256"))
+
+# LLM gateway: "providers" (Groq/OpenAI) or "fake" (offline canned answers); per-provider concurrency
+LLM_BACKEND = os.getenv("LLM_BACKEND", "providers")
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "16"))
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Audio questions: uploads are kept in memory; large clips are transcoded to 16 kHz mono Opus when ffmpeg is available
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(25 * 1024 * 1024)))
+AUDIO_TRANSCODE_ENABLED = os.getenv("AUDIO_TRANSCODE_ENABLED", "true").lower() == "true"
+AUDIO_TRANSCODE_MIN_BYTES = int(os.getenv("AUDIO_TRANSCODE_MIN_BYTES", str(1024 * 1024)))
+AUDIO_TRANSCODE_BITRATE = os.getenv("AUDIO_TRANSCODE_BITRATE", "24k")
+AUDIO_TRANSCODE_TIMEOUT_SECONDS = float(os.getenv("AUDIO_TRANSCODE_TIMEOUT_SECONDS", "30"))
+
+# Context packing: reranked passages are deduplicated and trimmed to a per-model token budget.
+# The defaults match the original prompt (the top 3 reranked chunks of up to 512 tokens each), so
+# packing only ever shrinks it; CONTEXT_MAX_PASSAGES is capped below each path's retrieval top_k.
+# CONTEXT_TOKEN_BUDGETS overrides the default per model, e.g. "llama-3.3-70b-versatile=3000,llama-3.1-8b-instant=1500"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1536"))
+CONTEXT_TOKEN_BUDGETS = {
+    model.strip(): int(budget)
+    for model, budget in (item.split("=") for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(",") if "=" in item)
+}
+CONTEXT_MAX_PASSAGES = int(os.getenv("CONTEXT_MAX_PASSAGES", "3"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_MIN_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MIN_PASSAGE_TOKENS", "64"))
+
+# Multi-document questions: per-document retrieval fans out concurrently, candidates are reranked together
+MULTI_DOC_MAX_DOCUMENTS = int(os.getenv("MULTI_DOC_MAX_DOCUMENTS", "20"))
+MULTI_DOC_TOP_K = int(os.getenv("MULTI_DOC_TOP_K", "3"))
+MULTI_DOC_MAX_PASSAGES = int(os.getenv("MULTI_DOC_MAX_PASSAGES", "8"))
+
+# Batch questions: one embedding call per batch, bounded concurrent retrieval and completions
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+BATCH_RETRIEVAL_CONCURRENCY = int(os.getenv("BATCH_RETRIEVAL_CONCURRENCY", "16"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Prometheus metrics on /metrics: request and per-stage latency histograms
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
@@ -0,0 +1,104 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from app.models import DocumentPDF, DocumentChunkPDF
+from app.database import SessionLocal
+
+
+def get_document(db: Session, username: str, pdf_id: str) -> Optional[DocumentPDF]:
+    return db.query(DocumentPDF).filter(
+        DocumentPDF.username == username,
+        DocumentPDF.pdf_id == pdf_id
+    ).first()
+
+
+def get_documents(db: Session, username: str, pdf_ids: Optional[List[str]] = None) -> List[DocumentPDF]:
+    """Documents of a user, restricted to pdf_ids when given, most recently updated first."""
+    query = db.query(DocumentPDF).filter(DocumentPDF.username == username)
+    if pdf_ids is not None:
+        query = query.filter(DocumentPDF.pdf_id.in_(pdf_ids))
+    return query.order_by(DocumentPDF.updated_at.desc()).all()
+
+
+def get_indexed_document_by_hash(db: Session, username: str, content_hash: str, status: str = "indexed") -> Optional[DocumentPDF]:
+    """Returns a document in the user's namespace with the same content and status (fully indexed by default), if any."""
+    return db.query(DocumentPDF).filter(
+        DocumentPDF.username == username,
+        DocumentPDF.content_hash == content_hash,
+        DocumentPDF.status == status
+    ).order_by(
+        DocumentPDF.updated_at.desc()
+    ).first()
+
+
+def save_document(db: Session, username: str, pdf_id: str, content_hash: str, status: str, chunk_count: int = None) -> DocumentPDF:
+    document = get_document(db, username, pdf_id)
+    if document is None:
+        document = DocumentPDF(username=username, pdf_id=pdf_id)
+        db.add(document)
+    document.content_hash = content_hash
+    document.status = status
+    if chunk_count is not None:
+        document.chunk_count = chunk_count
+    try:
+        db.commit()
+        db.refresh(document)
+        return document
+    except Exception:
+        db.rollback()
+        raise
+
+
+def set_document_status(username: str, pdf_id: str, content_hash: str, status: str, chunk_count: int = None):
+    """Session-managing variant of save_document for code running outside a request (ingestion workers)."""
+    db = SessionLocal()
+    try:
+        save_document(db, username, pdf_id, content_hash, status, chunk_count)
+    finally:
+        db.close()
+
+
+def get_chunk_manifest(username: str, pdf_id: str) -> List[DocumentChunkPDF]:
+    """Loads the chunk manifest of a document, ordered by chunk_index, in a fresh session."""
+    db = SessionLocal()
+    try:
+        chunks = db.query(DocumentChunkPDF).filter(
+            DocumentChunkPDF.username == username,
+            DocumentChunkPDF.pdf_id == pdf_id
+        ).order_by(
+            DocumentChunkPDF.chunk_index
+        ).all()
+        db.expunge_all()
+        return chunks
+    finally:
+        db.close()
+
+
+def replace_chunk_manifest(username: str, pdf_id: str, manifest: List[Tuple[str, str]]):
+    """Replaces the stored (chunk_hash, vector_id) list of a document, in chunk order."""
+    db = SessionLocal()
+    try:
+        db.query(DocumentChunkPDF).filter(
+            DocumentChunkPDF.username == username,
+            DocumentChunkPDF.pdf_id == pdf_id
+        ).delete()
+        db.add_all([
+            DocumentChunkPDF(username=username, pdf_id=pdf_id, chunk_index=idx, chunk_hash=chunk_hash, vector_id=vector_id)
+            for idx, (chunk_hash, vector_id) in enumerate(manifest)
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def delete_documents(db: Session, username: str) -> int:
+    try:
+        db.query(DocumentChunkPDF).filter(DocumentChunkPDF.username == username).delete()
+        deleted = db.query(DocumentPDF).filter(DocumentPDF.username == username).delete()
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
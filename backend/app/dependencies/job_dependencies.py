@@ -0,0 +1,149 @@
+from datetime import datetime
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.models import IngestionJobPDF, DocumentPDF
+from app.database import SessionLocal
+
+FINISHED_STAGES = ("completed", "failed")
+
+
+def _job_to_dict(row: IngestionJobPDF) -> Dict[str, Any]:
+    # Same shape as IngestionJob.to_dict.
+    return {
+        "job_id": row.job_id,
+        "kind": row.kind,
+        "source": row.source,
+        "stage": row.stage,
+        "stages": row.stages or {},
+        "chunks_total": row.chunks_total or 0,
+        "chunks_embedded": row.chunks_embedded or 0,
+        "chunks_upserted": row.chunks_upserted or 0,
+        "chunks_reused": row.chunks_reused or 0,
+        "error": row.error,
+        "result": row.result or {},
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+
+def get_job(db: Session, username: str, job_id: str) -> Optional[Dict[str, Any]]:
+    row = db.query(IngestionJobPDF).filter(
+        IngestionJobPDF.username == username,
+        IngestionJobPDF.job_id == job_id
+    ).first()
+    return _job_to_dict(row) if row is not None else None
+
+
+def get_active_job(db: Session, username: str, source: str) -> Optional[Dict[str, Any]]:
+    """The most recent unfinished job of a user for a source, on any worker."""
+    row = db.query(IngestionJobPDF).filter(
+        IngestionJobPDF.username == username,
+        IngestionJobPDF.source == source,
+        IngestionJobPDF.stage.notin_(FINISHED_STAGES)
+    ).order_by(
+        IngestionJobPDF.created_at.desc()
+    ).first()
+    return _job_to_dict(row) if row is not None else None
+
+
+def is_superseded(username: str, source: str, job_id: str) -> bool:
+    """
+    True when another unfinished job for the same source was created before job_id. Two uploads
+    that both passed the active-job check in the request then agree on which one proceeds.
+    """
+    db = SessionLocal()
+    try:
+        first = db.query(IngestionJobPDF).filter(
+            IngestionJobPDF.username == username,
+            IngestionJobPDF.source == source,
+            IngestionJobPDF.stage.notin_(FINISHED_STAGES)
+        ).order_by(
+            IngestionJobPDF.created_at, IngestionJobPDF.job_id
+        ).first()
+        return first is not None and first.job_id != job_id
+    finally:
+        db.close()
+
+
+def save_jobs(jobs: List[Tuple[str, Dict[str, Any]]], owner: str):
+    """
+    Inserts or updates (username, IngestionJob.to_dict()) job states in a fresh session and stamps
+    them with the owning worker and a heartbeat.
+    """
+    if not jobs:
+        return
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows = {
+            row.job_id: row for row in db.query(IngestionJobPDF).filter(
+                IngestionJobPDF.job_id.in_([job["job_id"] for _, job in jobs])
+            )
+        }
+        for username, job in jobs:
+            row = rows.get(job["job_id"])
+            if row is None:
+                row = IngestionJobPDF(job_id=job["job_id"], username=username)
+                db.add(row)
+            row.kind = job["kind"]
+            row.source = job["source"]
+            row.stage = job["stage"]
+            row.stages = job["stages"]
+            row.chunks_total = job["chunks_total"]
+            row.chunks_embedded = job["chunks_embedded"]
+            row.chunks_upserted = job["chunks_upserted"]
+            row.chunks_reused = job["chunks_reused"]
+            row.error = job["error"]
+            row.result = job["result"]
+            row.created_at = datetime.fromisoformat(job["created_at"])
+            row.updated_at = datetime.fromisoformat(job["updated_at"])
+            row.owner = owner
+            row.heartbeat_at = now
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def fail_orphaned_jobs(is_orphaned: Callable[[IngestionJobPDF], bool], error: str) -> Tuple[int, int]:
+    """
+    Marks unfinished jobs selected by is_orphaned as failed, then fails every document still in
+    'processing' that no unfinished job is working on. Returns (jobs failed, documents failed).
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        # Documents are read before jobs: an upload saves its job before marking the document as
+        # processing, so a document seen here already has its job row.
+        processing = db.query(DocumentPDF).filter(DocumentPDF.status == "processing").all()
+        unfinished = db.query(IngestionJobPDF).filter(IngestionJobPDF.stage.notin_(FINISHED_STAGES)).all()
+        active_sources = set()
+        failed_jobs = 0
+        for row in unfinished:
+            if not is_orphaned(row):
+                active_sources.add((row.username, row.source))
+                continue
+            stages = dict(row.stages or {})
+            if row.stage in stages and not stages[row.stage].get("finished_at"):
+                stages[row.stage] = {**stages[row.stage], "finished_at": now.isoformat()}
+            stages["failed"] = {"started_at": now.isoformat(), "finished_at": None}
+            row.stages = stages
+            row.stage = "failed"
+            row.error = error
+            row.updated_at = now
+            failed_jobs += 1
+
+        failed_documents = 0
+        for document in processing:
+            if (document.username, document.pdf_id) not in active_sources:
+                document.status = "failed"
+                failed_documents += 1
+        db.commit()
+        return failed_jobs, failed_documents
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
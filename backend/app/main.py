@@ -3,8 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.routes import auth_routes, user_routes, document_routes, system_message_routes, youtube_routes,blandai_routes
 from app.middlewares.logging_middleware import log_requests
-from app.config import SECRET_KEY, DATABASE_URL
+from app.middlewares.metrics_middleware import record_metrics
+from app.config import SECRET_KEY, DATABASE_URL, WARMUP_ENABLED
 from app.database import engine, Base
+from app.utils.job_queue import job_queue
+from app.utils.pdf_utils import shutdown_parse_executor
+from app.utils.rerank_utils import reranker
+from app.utils.llm_gateway import llm_gateway
+from app.services.warmup_service import run_warmup, mark_ready, warmup_state
+from app.utils.metrics import render_metrics
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import logging
 import warnings
 
@@ -26,8 +35,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Answer-Cache", "X-Answer-Cache-Similarity"],
 )
 app.middleware("http")(log_requests)
+app.middleware("http")(record_metrics)
 
 # Include routers
 app.include_router(auth_routes.router)
@@ -45,6 +56,18 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    # Load balancers should route to this worker only once warmup is done.
+    return JSONResponse(content=warmup_state.to_dict(), status_code=200 if warmup_state.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format; histograms are per worker process.
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+warmup_task = None
+
 # Database connection and table creation
 @app.on_event("startup")
 async def startup_event():
@@ -59,6 +82,23 @@ async def startup_event():
     except Exception as e:
         logging.error(f"Failed to make database connection. Error: {e}")
         raise
+    await job_queue.start()
+    global warmup_task
+    if WARMUP_ENABLED:
+        # Runs in the background so /health answers while the worker is still warming up.
+        warmup_task = asyncio.create_task(run_warmup())
+    else:
+        mark_ready()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    logging.info("Shutdown event triggered")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await job_queue.stop()
+    shutdown_parse_executor()
+    await reranker.close()
+    await llm_gateway.close()
 
 # Ensure logging is configured
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
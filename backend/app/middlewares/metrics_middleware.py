@@ -0,0 +1,31 @@
+from fastapi import Request
+from starlette.routing import Match
+import time
+
+from app.config import METRICS_ENABLED
+from app.utils.metrics import REQUEST_SECONDS, current_endpoint
+
+
+def _route_path(request: Request) -> str:
+    # The route template (e.g. /api/docs/upload-status/{job_id}) keeps the label set small.
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+async def record_metrics(request: Request, call_next):
+    if not METRICS_ENABLED:
+        return await call_next(request)
+    endpoint = _route_path(request)
+    token = current_endpoint.set(endpoint)
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, status)
+        current_endpoint.reset(token)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, JSON
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -20,3 +20,43 @@ class SystemMessagePDF(Base):
     username = Column(String, index=True)
     timestamp = Column(DateTime, index=True)
     avtar_name = Column(String,unique = True)
+
+class DocumentPDF(Base):
+    __tablename__ = "documents_pdf"
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, index=True)
+    pdf_id = Column(String, index=True)
+    content_hash = Column(String, index=True)
+    chunk_count = Column(Integer, default=0)
+    status = Column(String, default="processing")
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class DocumentChunkPDF(Base):
+    __tablename__ = "document_chunks_pdf"
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, index=True)
+    pdf_id = Column(String, index=True)
+    chunk_index = Column(Integer)
+    chunk_hash = Column(String)
+    vector_id = Column(String)
+
+class IngestionJobPDF(Base):
+    __tablename__ = "ingestion_jobs_pdf"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True)
+    username = Column(String, index=True)
+    kind = Column(String)
+    source = Column(String, index=True)
+    stage = Column(String, index=True)
+    stages = Column(JSON, default=dict)
+    chunks_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    chunks_upserted = Column(Integer, default=0)
+    chunks_reused = Column(Integer, default=0)
+    error = Column(String)
+    result = Column(JSON, default=dict)
+    owner = Column(String)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    heartbeat_at = Column(DateTime, index=True)
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status,Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app.schemas import ProcessDocRequest, GenerateResponseRequest, GetDocRequest
+from app.schemas import ProcessDocRequest, GenerateResponseRequest, MultiDocumentQueryRequest, BatchQuestionRequest, GetDocRequest
 from app.dependencies.auth_dependencies import get_current_user
 from app.dependencies.db_dependencies import get_db
 from app.models import UserPDF
-from app.services.document_service import generate_response, generate_response_audio, upload_doc,get_doc_helper,delete_namespace_vectors_and_pdfs
+from app.services.document_service import generate_response, generate_response_stream, generate_response_audio, generate_response_audio_stream, generate_multi_document_response, generate_batch_response, upload_doc,get_doc_helper,delete_namespace_vectors_and_pdfs, get_upload_status, get_cache_stats
 import logging
 
 router = APIRouter(prefix = "/api/docs",tags=["Documents"])
@@ -14,14 +14,49 @@ router = APIRouter(prefix = "/api/docs",tags=["Documents"])
 async def generate_response_route(request: GenerateResponseRequest, current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
     return await generate_response(request, current_user, db)
 
+@router.post("/generate-response-stream")
+async def generate_response_stream_route(request: GenerateResponseRequest, current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Endpoint to stream the answer as Server-Sent Events while it is generated.
+    """
+    return await generate_response_stream(request, current_user, db)
+
+@router.post("/generate-response-multi")
+async def generate_multi_document_response_route(request: MultiDocumentQueryRequest, current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Endpoint to ask one question across several documents (pdf_ids omitted: all of the user's documents).
+    """
+    return await generate_multi_document_response(request, current_user, db)
+
+@router.post("/generate-response-batch")
+async def generate_batch_response_route(request: BatchQuestionRequest, current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Endpoint to answer many questions against one document; answers stream back as NDJSON as they complete.
+    """
+    return await generate_batch_response(request, current_user, db)
+
 @router.post("/generate-response-audio")
 async def generate_response_audio_route(pdf_id: str = Query(...),audio_file: UploadFile = File(...), current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
     logging.info(f"{current_user}")
     return await generate_response_audio(pdf_id,audio_file, current_user, db)
 
+@router.post("/generate-response-audio-stream")
+async def generate_response_audio_stream_route(pdf_id: str = Query(...),audio_file: UploadFile = File(...), current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Endpoint to stream the answer to a spoken question as Server-Sent Events.
+    """
+    return await generate_response_audio_stream(pdf_id, audio_file, current_user, db)
+
 @router.post("/upload-doc")
-async def upload_doc_route(file: UploadFile = File(...), current_user: UserPDF = Depends(get_current_user)):
-    return await upload_doc(file, current_user)
+async def upload_doc_route(file: UploadFile = File(...), current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    return await upload_doc(file, current_user, db)
+
+@router.get("/upload-status/{job_id}")
+async def upload_status_route(job_id: str, current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Endpoint to follow the background ingestion of an uploaded document.
+    """
+    return await get_upload_status(job_id, current_user, db)
 
 
 
@@ -29,9 +64,16 @@ async def upload_doc_route(file: UploadFile = File(...), current_user: UserPDF =
 async def get_doc_route(filename: str = Query(..., min_length=1), current_user: UserPDF = Depends(get_current_user)):
     return await get_doc_helper(filename=filename, current_user=current_user)
 
+@router.get("/cache-stats")
+async def cache_stats_route(current_user: UserPDF = Depends(get_current_user)):
+    """
+    Endpoint to inspect cache hit rates.
+    """
+    return await get_cache_stats()
+
 @router.delete("/namespace-data", status_code=200)
-async def delete_vectors_and_pdf_route(current_user: UserPDF = Depends(get_current_user)):
+async def delete_vectors_and_pdf_route(current_user: UserPDF = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Endpoint to delete all vectors in the Pinecone index for the current user's namespace.
     """
-    return await delete_namespace_vectors_and_pdfs(current_user)
\ No newline at end of file
+    return await delete_namespace_vectors_and_pdfs(current_user, db)
\ No newline at end of file
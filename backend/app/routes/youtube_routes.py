@@ -3,6 +3,7 @@ from app.schemas import YoutubeRequest, YoutubeQueryRequest
 from app.services.youtube_service import (
     process_upload_youtube_transcript ,
     generate_response_youtube_url_query,
+    generate_response_youtube_url_query_stream,
     generate_video_summary
 )
 from app.dependencies.auth_dependencies import get_current_user
@@ -28,7 +29,7 @@ async def upload_youtube_transcript_handler(
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/transcript", status_code=status.HTTP_200_OK)
-def get_youtube_transcript_handler(
+async def get_youtube_transcript_handler(
     youtube_url: str = Query(...), 
     current_user: UserPDF = Depends(get_current_user)
 ):
@@ -36,7 +37,7 @@ def get_youtube_transcript_handler(
     Get a YouTube transcript using a query parameter instead of request body.
     """
     try:
-        return generate_video_summary(youtube_url, current_user)
+        return await generate_video_summary(youtube_url, current_user)
     except Exception as error:
         logging.error(f"Error in get_youtube_transcript_handler: {error}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -59,4 +60,24 @@ async def query_youtube_transcript_handler(
         )
     except Exception as error:
         logging.error(f"Error in query_youtube_transcript_handler: {error}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/query-stream", status_code=status.HTTP_200_OK)
+async def query_youtube_transcript_stream_handler(
+    query: str = Query(...),
+    video_id: str = Query(...),
+    current_user: UserPDF = Depends(get_current_user)
+):
+    """
+    Query a YouTube video transcript and stream the answer as Server-Sent Events.
+    """
+    try:
+        return await generate_response_youtube_url_query_stream(
+            query=query,
+            video_id=video_id,
+            current_user=current_user
+        )
+    except Exception as error:
+        logging.error(f"Error in query_youtube_transcript_stream_handler: {error}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
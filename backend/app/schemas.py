@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class SigninRequest(BaseModel):
     username: str
@@ -33,6 +33,14 @@ class ProcessDocRequest(BaseModel):
 class GenerateResponseRequest(BaseModel):
     query: str
     pdf_id: str
+
+class MultiDocumentQueryRequest(BaseModel):
+    query: str
+    pdf_ids: Optional[List[str]] = None  # None: every document in the user's namespace
+
+class BatchQuestionRequest(BaseModel):
+    pdf_id: str
+    questions: List[str]
     
 class GetDocRequest(BaseModel):
     filename: str
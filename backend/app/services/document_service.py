@@ -2,32 +2,285 @@ from urllib.parse import urlparse
 from fastapi import UploadFile, HTTPException, status,Query
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app.schemas import ProcessDocRequest, GenerateResponseRequest
-from app.models import UserPDF
-from app.utils.s3_utils import upload_to_s3, s3_client
-from app.utils.embedding_utils import embeddings, chunker, pc, index_name
-from app.utils.rerank_utils import rerank_documents
-from app.config import S3_BUCKET_NAME
-import pymupdf4llm
+from app.schemas import ProcessDocRequest, GenerateResponseRequest, MultiDocumentQueryRequest, BatchQuestionRequest
+from app.models import UserPDF, DocumentPDF
+from app.utils.s3_utils import get_s3_key, get_filename, upload_file_to_s3, s3_client
+from app.utils.file_utils import spool_upload
+from app.utils.pdf_utils import iter_markdown_batches
+from app.dependencies.document_dependencies import (
+    get_document, get_documents, get_indexed_document_by_hash, save_document, set_document_status, delete_documents,
+    get_chunk_manifest, replace_chunk_manifest
+)
+from app.dependencies.job_dependencies import get_job, get_active_job, is_superseded
+from app.utils.embedding_utils import get_embeddings, get_embedding_cache, get_embedding_executor, get_index
+from app.utils.rerank_utils import rerank_documents, reranker
+from app.utils.vector_cache import vector_cache, load_document_vectors
+from app.utils.answer_cache import answer_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.sse_utils import sse_response, single_chunk
+from app.utils.llm_gateway import llm_gateway
+from app.utils.audio_utils import read_audio_upload, compact_audio
+from app.utils.context_packer import context_packer, get_token_budget
+from app.utils.metrics import stage_timer, current_endpoint
+from app.utils.bm25 import BM25IndexBuilder
+from app.utils.hybrid_utils import (
+    bm25_indexes, get_bm25_key, save_bm25_index, reciprocal_rank_fusion, fetch_texts
+)
+from app.utils.prompt_utils import get_prompt
+from app.config import (
+    S3_BUCKET_NAME, HYBRID_RETRIEVAL_ENABLED, CONTEXT_MAX_PASSAGES, MULTI_DOC_MAX_DOCUMENTS, MULTI_DOC_TOP_K,
+    MULTI_DOC_MAX_PASSAGES, BATCH_MAX_QUESTIONS, BATCH_RETRIEVAL_CONCURRENCY, BATCH_LLM_CONCURRENCY
+)
 import os
-import tempfile
-import uuid
+import re
+import json
+import hashlib
+import asyncio
 import logging
+import time
 import aiohttp
+from typing import Callable, Dict, List, Optional, Tuple
 from botocore.exceptions import ClientError
-from app.utils.helpers_utils import batch_iterable
+from app.utils.upsert_utils import (
+    PineconeUpserter, update_vector_metadata, delete_vectors, filter_owned_vectors, list_vector_ids
+)
+from app.utils.ingestion_pipeline import run_ingestion_pipeline
+from app.utils.job_queue import IngestionJob, QueueFullError, job_queue
 from app.dependencies.system_message_dependencies import get_latest_system_message
-from groq import Groq
-from langchain import hub
-from openai import OpenAI
-from app.config import GROQ_API_KEY,OPENAI_API_KEY
 
 
 
-groq_client = Groq(api_key=GROQ_API_KEY)
-prompt = hub.pull("rlm/rag-prompt")
-client = OpenAI(api_key=OPENAI_API_KEY)
+prompt = get_prompt("rag_prompt")
 
+# Chunks retrieved per question before reranking; the reranker keeps fewer than this.
+RETRIEVAL_TOP_K = 5
+
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def invalidate_document_caches(username: str, pdf_id: str = None):
+    """Drops cached vectors and answers of one document, or of the whole namespace when pdf_id is None."""
+    if vector_cache is not None:
+        vector_cache.invalidate(username, pdf_id)
+    if answer_cache is not None:
+        answer_cache.invalidate(username, pdf_id)
+    if semantic_cache is not None:
+        semantic_cache.invalidate(username, pdf_id)
+    bm25_indexes.invalidate(get_bm25_key(pdf_id) if pdf_id else get_s3_key(username, ""))
+
+
+async def retrieve_chunk_texts(document: Optional[DocumentPDF], username: str, pdf_id: str, query: str,
+                               query_vector: List[float], top_k: int = RETRIEVAL_TOP_K) -> List[str]:
+    """
+    Top-k chunk texts of one document for a query.
+    Indexed documents with a chunk manifest are searched in memory through the hot-document vector
+    cache (their vectors are fetched once on the first question); anything else is queried in
+    Pinecone with a pdf_id filter. When the document has a BM25 index, its lexical top-k is fused
+    with the dense top-k by reciprocal rank, so exact identifiers are found even when the
+    embedding misses them.
+    """
+    index = get_index()
+    indexed = document is not None and document.status == "indexed"
+    lexical_ids = []
+    if HYBRID_RETRIEVAL_ENABLED and indexed:
+        bm25_index = await bm25_indexes.get(get_bm25_key(pdf_id), document.content_hash)
+        if bm25_index is not None:
+            lexical_ids = [vector_id for vector_id, _ in bm25_index.search(query, top_k)]
+
+    if vector_cache is not None and indexed:
+        async def load():
+            chunks = await asyncio.to_thread(get_chunk_manifest, username, pdf_id)
+            return await load_document_vectors(index, username, document.content_hash, [chunk.vector_id for chunk in chunks])
+
+        cached = await vector_cache.get_or_load(username, pdf_id, document.content_hash, load)
+        if cached is not None:
+            dense_ids = [cached.ids[row] for row, _ in cached.search(query_vector, top_k)]
+            ranked_ids = reciprocal_rank_fusion(dense_ids, lexical_ids)[:top_k] if lexical_ids else dense_ids
+            return [cached.texts[cached.rows[vector_id]] for vector_id in ranked_ids if vector_id in cached.rows]
+
+    # Now filtering for the current PDF context using pdf_id
+    fetch_result = await asyncio.to_thread(
+        index.query,
+        vector=query_vector,
+        top_k=top_k,
+        include_metadata=True,
+        namespace=username,
+        filter={"pdf_id": pdf_id}
+    )
+    texts = {match.id: match.metadata["text"] for match in fetch_result.matches}
+    if not lexical_ids:
+        return list(texts.values())
+    ranked_ids = reciprocal_rank_fusion(list(texts), lexical_ids)[:top_k]
+    texts.update(await fetch_texts(index, username, [vector_id for vector_id in ranked_ids if vector_id not in texts]))
+    return [texts[vector_id] for vector_id in ranked_ids if vector_id in texts]
+
+
+PDF_INSTRUCTIONS = (
+    "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. "
+)
+AUDIO_INSTRUCTIONS = (
+    PDF_INSTRUCTIONS
+    + "If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise."
+)
+CHAT_MODEL = "llama-3.3-70b-versatile"
+
+
+class AnswerPlan:
+    """
+    Outcome of the retrieval stage for one question: either a cached answer, or the chat messages
+    to send to the LLM plus a callback that stores the generated answer in the caches.
+    """
+
+    def __init__(self, cached_answer: str = None, cache_status: str = "bypass", similarity: float = None,
+                 messages: List[Dict[str, str]] = None, on_answer: Callable[[str], None] = None):
+        self.cached_answer = cached_answer
+        self.cache_status = cache_status
+        self.similarity = similarity
+        self.messages = messages
+        self.on_answer = on_answer
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"X-Answer-Cache": self.cache_status}
+        if self.similarity is not None:
+            headers["X-Answer-Cache-Similarity"] = f"{self.similarity:.4f}"
+        return headers
+
+    def remember(self, answer: str):
+        if self.on_answer is not None:
+            self.on_answer(answer)
+
+
+async def plan_pdf_answer(db: Session, username: str, pdf_id: str, query: str, system_message: str,
+                          instructions: str = PDF_INSTRUCTIONS) -> AnswerPlan:
+    """
+    Looks the question up in the answer caches and, on a miss, retrieves and reranks context from
+    the PDF and builds the chat messages.
+    """
+    document = get_document(db, username, pdf_id)
+    return await plan_document_answer(document, username, pdf_id, query, system_message, instructions)
+
+
+async def plan_document_answer(document: Optional[DocumentPDF], username: str, pdf_id: str, query: str,
+                               system_message: str, instructions: str = PDF_INSTRUCTIONS,
+                               query_vector: Optional[List[float]] = None) -> AnswerPlan:
+    """
+    plan_pdf_answer for an already loaded document row (None for documents without one); needs no
+    DB session. query_vector can be passed when the question is already embedded.
+    """
+    started = time.perf_counter()
+    content_hash = document.content_hash if document is not None else None
+    # The instructions are part of the cache key: text and audio answers differ in length.
+    formatted_system_message = f" {system_message}{instructions}"
+    # While a version is being ingested its content_hash is already stored but its vectors are not
+    # all there yet, so answers are neither served from nor stored in the caches until it is indexed.
+    cacheable = document is not None and document.status == "indexed"
+    # Invalidations while this answer is produced mean it may predate them: it is then not stored.
+    answer_generation = answer_cache.generation if answer_cache is not None else None
+    semantic_generation = semantic_cache.generation if semantic_cache is not None else None
+
+    cache_key = None
+    if answer_cache is not None and cacheable:
+        cache_key = answer_cache.make_key(username, pdf_id, content_hash, query, formatted_system_message)
+        cached_answer = answer_cache.get(cache_key)
+        if cached_answer is not None:
+            return AnswerPlan(cached_answer=cached_answer, cache_status="hit")
+
+    if query_vector is None:
+        with stage_timer("embed"):
+            query_vector = await get_embeddings().aembed_query(query)
+
+    semantic_key = None
+    if semantic_cache is not None and cacheable:
+        semantic_key = semantic_cache.make_key(username, pdf_id, content_hash, formatted_system_message)
+        match = semantic_cache.lookup(semantic_key, query_vector)
+        if match is not None:
+            cached_answer, similarity = match
+            if cache_key is not None and answer_cache.generation == answer_generation:
+                answer_cache.put(cache_key, username, pdf_id, cached_answer, time.perf_counter() - started)
+            return AnswerPlan(cached_answer=cached_answer, cache_status="semantic-hit", similarity=similarity)
+
+    with stage_timer("retrieve"):
+        retrieved_texts = await retrieve_chunk_texts(document, username, pdf_id, query, query_vector)
+
+    with stage_timer("rerank"):
+        reranked_docs = await rerank_documents(query, retrieved_texts, top_n=min(CONTEXT_MAX_PASSAGES, RETRIEVAL_TOP_K - 1))
+    packed = context_packer.pack([doc['document']['text'] for doc in reranked_docs], get_token_budget(CHAT_MODEL))
+
+    logging.info(f"Formatted System Message: {formatted_system_message}")
+
+    formatted_prompt = prompt.format(context=packed.text, question=query)
+    logging.info(f"Formatted prompt: {formatted_prompt}")
+
+    def remember(answer: str):
+        if cache_key is not None and answer_cache.generation == answer_generation:
+            answer_cache.put(cache_key, username, pdf_id, answer, time.perf_counter() - started)
+        if semantic_key is not None and semantic_cache.generation == semantic_generation:
+            semantic_cache.add(semantic_key, query_vector, answer)
+
+    messages = [
+        {
+            "role": "system",
+            "content": formatted_system_message
+        },
+        {
+            "role": "user",
+            "content": formatted_prompt
+        }
+    ]
+    prompt_tokens = context_packer.record_prompt(messages)
+    logging.info(
+        f"Prompt tokens: {prompt_tokens} (context {packed.tokens}, {len(packed.passages)} passages, "
+        f"{packed.duplicates} duplicates and {packed.dropped} over budget dropped)"
+    )
+
+    return AnswerPlan(
+        cache_status="miss" if cache_key is not None or semantic_key is not None else "bypass",
+        messages=messages,
+        on_answer=remember
+    )
+
+
+async def complete_answer(plan: AnswerPlan) -> str:
+    if plan.cached_answer is not None:
+        return plan.cached_answer
+    answer = await llm_gateway.chat(
+        messages=plan.messages,
+        model=CHAT_MODEL,
+        max_tokens=1024,
+        temperature=0.7
+    )
+    plan.remember(answer)
+    return answer
+
+
+def stream_answer(plan: AnswerPlan) -> StreamingResponse:
+    if plan.cached_answer is not None:
+        return sse_response(single_chunk(plan.cached_answer), headers=plan.headers())
+    tokens = llm_gateway.stream_chat(
+        messages=plan.messages,
+        model=CHAT_MODEL,
+        max_tokens=1024,
+        temperature=0.7
+    )
+    return sse_response(tokens, on_complete=plan.remember, headers=plan.headers())
+
+
+async def transcribe_audio(audio_file: UploadFile) -> str:
+    """
+    Transcribes an uploaded question straight from memory; no file is written, so concurrent
+    audio requests are independent.
+    """
+    query = None
+    if audio_file:
+        filename, data = await read_audio_upload(audio_file)
+        if data:
+            query = await llm_gateway.transcribe(await compact_audio(filename, data), model="whisper-1")
+            logging.info(f"Transcribed query: {query}")
+
+    if not query:
+        raise HTTPException(status_code=400, detail="No query or audio file provided")
+
+    return query
 
 
 async def generate_response(request: GenerateResponseRequest, current_user: UserPDF, db: Session):
@@ -37,58 +290,17 @@ async def generate_response(request: GenerateResponseRequest, current_user: User
     """
     try:
         logging.info("In the Generate Response")
-        query = request.query
-        pdf_id = request.pdf_id  # new field for filtering by PDF context
-        username = current_user.username
         system_message = ""
-
-        index = pc.Index(index_name)
-        query_vector = embeddings.embed_query(query)
-        # Now filtering for the current PDF context using pdf_id
-        fetch_result = index.query(
-            vector=query_vector,
-            top_k=5,
-            include_metadata=True,
-            namespace=username,
-            filter={"pdf_id": pdf_id}
-        )
-        retrieved_texts = [match.metadata["text"] for match in fetch_result.matches]
-
-        reranked_docs = await rerank_documents(query, retrieved_texts)
-        context = " ".join([doc['document']['text'] for doc in reranked_docs])
-
-        formatted_system_message = "".join(
-            f" {system_message}"
-            "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. "
-        )
-        logging.info(f"Formatted System Message: {formatted_system_message}")
-
-        formatted_prompt = prompt.format(context=context, question=query)
-        logging.info(f"Formatted prompt: {formatted_prompt}")
-
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": formatted_system_message
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            max_tokens=1024,
-            temperature=0.7,
-            stream=False
-        )
+        plan = await plan_pdf_answer(db, current_user.username, request.pdf_id, request.query, system_message)
+        answer = await complete_answer(plan)
 
         return JSONResponse(
             content={
                 "message": "Response generated successfully!",
-                "response": chat_completion.choices[0].message.content
+                "response": answer
             },
-            status_code=200
+            status_code=200,
+            headers=plan.headers()
         )
 
     except Exception as e:
@@ -96,155 +308,549 @@ async def generate_response(request: GenerateResponseRequest, current_user: User
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def generate_response_stream(request: GenerateResponseRequest, current_user: UserPDF, db: Session):
+    """
+    Streaming variant of generate_response: retrieval runs first, then the completion is sent to
+    the client token by token over Server-Sent Events.
+    """
+    try:
+        logging.info("In the Generate Response Stream")
+        system_message = ""
+        plan = await plan_pdf_answer(db, current_user.username, request.pdf_id, request.query, system_message)
+        return stream_answer(plan)
+
+    except Exception as e:
+        logging.error(f"Response generation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 async def generate_response_audio(pdf_id: str = Query(...), audio_file: UploadFile = None, current_user: UserPDF = None, db: Session = None):
     """
     Generates a response based on an audio file (transcribed to text) and retrieves PDF-specific context.
     The pdf_id is passed as a query parameter.
     """
     try:
-        query = None
         logging.info("In the Generate Response Audio")
         username = current_user.username
         system_msg_obj = get_latest_system_message(username, db)
         system_message = system_msg_obj.message if system_msg_obj is not None else ""
         logging.info(f"Current System Message: {system_message}")
 
-        if audio_file:
-            with open("temp_audio.mp3", "wb") as buffer:
-                buffer.write(await audio_file.read())
+        query = await transcribe_audio(audio_file)
+        plan = await plan_pdf_answer(db, username, pdf_id, query, system_message, instructions=AUDIO_INSTRUCTIONS)
+        answer = await complete_answer(plan)
 
-            with open("temp_audio.mp3", "rb") as audio:
-                transcription = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio
-                )
-                query = transcription.text
-                logging.info(f"Transcribed query: {query}")
-
-        if not query:
-            raise HTTPException(status_code=400, detail="No query or audio file provided")
-
-        os.remove("temp_audio.mp3")
-
-        index = pc.Index(index_name)
-        query_vector = embeddings.embed_query(query)
-        # Filtering results to only include vectors for the given pdf_id
-        fetch_result = index.query(
-            vector=query_vector,
-            top_k=5,
-            include_metadata=True,
-            namespace=username,
-            filter={"pdf_id": pdf_id}
+        return JSONResponse(
+            content={
+                "message": "Audio response generated successfully!",
+                "response": answer
+            },
+            status_code=200,
+            headers=plan.headers()
         )
-        retrieved_texts = [match.metadata["text"] for match in fetch_result.matches]
 
-        reranked_docs = await rerank_documents(query, retrieved_texts)
-        context = " ".join([doc['document']['text'] for doc in reranked_docs])
-        logging.info(f"Context: {context}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Response generation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        formatted_system_message = "".join(
-            f" {system_message}"
-            "You are an assistant for question-answering tasks. Use the following pieces of retrieved context to answer the question. "
-            "If you don't know the answer, just say that you don't know. Use three sentences maximum and keep the answer concise."
-        )
-        logging.info(f"Formatted System Message: {formatted_system_message}")
+async def generate_response_audio_stream(pdf_id: str, audio_file: UploadFile, current_user: UserPDF, db: Session):
+    """
+    Streaming variant of generate_response_audio: the transcribed question is answered over
+    Server-Sent Events.
+    """
+    try:
+        logging.info("In the Generate Response Audio Stream")
+        username = current_user.username
+        system_msg_obj = get_latest_system_message(username, db)
+        system_message = system_msg_obj.message if system_msg_obj is not None else ""
 
-        formatted_prompt = prompt.format(context=context, question=query)
-        logging.info(f"Formatted prompt: {formatted_prompt}")
+        query = await transcribe_audio(audio_file)
+        plan = await plan_pdf_answer(db, username, pdf_id, query, system_message, instructions=AUDIO_INSTRUCTIONS)
+        return stream_answer(plan)
 
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": formatted_system_message
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            max_tokens=1024,
-            temperature=0.7,
-            stream=True
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Response generation error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+MULTI_DOCUMENT_INSTRUCTIONS = (
+    PDF_INSTRUCTIONS
+    + "The context comes from several documents; each passage starts with the name of its document in brackets. "
+    "Say which document each part of your answer comes from, and point out where the documents differ."
+)
+
+
+async def generate_multi_document_response(request: MultiDocumentQueryRequest, current_user: UserPDF, db: Session):
+    """
+    Answers one question across several PDFs (request.pdf_ids, or every document in the namespace).
+    The query is embedded once, each document is searched concurrently, and the combined
+    candidates are reranked together; the answer lists which documents it drew on.
+    """
+    try:
+        logging.info("In the Generate Multi Document Response")
+        username = current_user.username
+        query = request.query
+
+        documents = {document.pdf_id: document for document in get_documents(db, username, request.pdf_ids)}
+        if request.pdf_ids is not None:
+            # Documents uploaded before status tracking have no record; they are searched through Pinecone.
+            pdf_ids = list(dict.fromkeys(request.pdf_ids))
+        else:
+            pdf_ids = [pdf_id for pdf_id, document in documents.items() if document.status == "indexed"]
+        if not pdf_ids:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No documents to search")
+        if len(pdf_ids) > MULTI_DOC_MAX_DOCUMENTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MULTI_DOC_MAX_DOCUMENTS} documents can be queried at once"
+            )
+
+        with stage_timer("embed"):
+            query_vector = await get_embeddings().aembed_query(query)
+        with stage_timer("retrieve"):
+            results = await asyncio.gather(*[
+                retrieve_chunk_texts(documents.get(pdf_id), username, pdf_id, query, query_vector, top_k=MULTI_DOC_TOP_K)
+                for pdf_id in pdf_ids
+            ])
+        candidates = [(pdf_id, text) for pdf_id, texts in zip(pdf_ids, results) for text in texts]
+
+        with stage_timer("rerank"):
+            reranked_docs = await rerank_documents(query, [text for _, text in candidates], top_n=MULTI_DOC_MAX_PASSAGES)
+        ranked = [candidates[doc['index']] for doc in reranked_docs]
+        packed = context_packer.pack(
+            [f"[{os.path.basename(pdf_id)}]\n{text}" for pdf_id, text in ranked], get_token_budget(CHAT_MODEL)
         )
 
+        messages = [
+            {
+                "role": "system",
+                "content": MULTI_DOCUMENT_INSTRUCTIONS
+            },
+            {
+                "role": "user",
+                "content": prompt.format(context=packed.text, question=query)
+            }
+        ]
+        prompt_tokens = context_packer.record_prompt(messages)
+        logging.info(f"Prompt tokens: {prompt_tokens} ({len(packed.passages)} passages from {len(pdf_ids)} documents)")
+        answer = await llm_gateway.chat(messages=messages, model=CHAT_MODEL, max_tokens=1024, temperature=0.7)
+
+        sources: Dict[str, int] = {}
+        for position in packed.indices:
+            pdf_id = ranked[position][0]
+            sources[pdf_id] = sources.get(pdf_id, 0) + 1
+
         return JSONResponse(
             content={
-                "message": "Audio response generated successfully!",
-                "response": chat_completion.choices[0].message.content
+                "message": "Response generated successfully!",
+                "response": answer,
+                "sources": [{"pdf_id": pdf_id, "passages": passages} for pdf_id, passages in sources.items()],
+                "documents_searched": len(pdf_ids)
             },
             status_code=200
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Response generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def upload_doc(file: UploadFile, current_user: UserPDF):
+async def generate_batch_response(request: BatchQuestionRequest, current_user: UserPDF, db: Session):
     """
-    Uploads a PDF file to S3, processes it to create text chunks, and upserts the embeddings to Pinecone.
-    The PDF identifier is stored in the metadata as 'pdf_id' (using the S3 key) for later filtering.
+    Answers a list of questions against one PDF, streamed back as NDJSON lines in completion order:
+        {"index", "question", "response", "cache"} or {"index", "question", "error"} per question,
+        then {"done": true, "answered", "failed"}.
+    All questions are embedded in one call; retrieval and completions run concurrently under
+    separate limits. A failing question is reported on its own line and does not stop the batch.
+    """
+    username = current_user.username
+    questions = request.questions
+    if not questions:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No questions provided")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BATCH_MAX_QUESTIONS} questions can be sent in one batch"
+        )
+    logging.info(f"In the Generate Batch Response: {len(questions)} questions")
+    # The request's DB session is closed before the response body streams, so the document row is
+    # loaded once here and the questions never touch the session.
+    document = get_document(db, username, request.pdf_id)
+
+    try:
+        with stage_timer("embed"):
+            query_vectors = await get_embeddings().aembed_documents(questions)
+    except Exception as e:
+        logging.error(f"Batch embedding error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    retrieval_slots = asyncio.Semaphore(BATCH_RETRIEVAL_CONCURRENCY)
+    completion_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    system_message = ""
+
+    async def answer(idx: int) -> Dict:
+        question = questions[idx]
+        try:
+            async with retrieval_slots:
+                plan = await plan_document_answer(
+                    document, username, request.pdf_id, question, system_message, query_vector=query_vectors[idx]
+                )
+            if plan.cached_answer is not None:
+                response = plan.cached_answer
+            else:
+                async with completion_slots:
+                    response = await complete_answer(plan)
+            return {"index": idx, "question": question, "response": response, "cache": plan.cache_status}
+        except Exception as e:
+            logging.error(f"Batch question {idx} failed: {str(e)}")
+            return {"index": idx, "question": question, "error": str(e) or type(e).__name__}
+
+    async def results():
+        tasks = [asyncio.create_task(answer(idx)) for idx in range(len(questions))]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += "error" in result
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "answered": len(tasks) - failed, "failed": failed}) + "\n"
+        finally:
+            # The client went away: stop the questions that are still running.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def upload_doc(file: UploadFile, current_user: UserPDF, db: Session):
+    """
+    Spools the uploaded PDF to local disk once and queues it for background ingestion.
+    The S3 upload and the parse -> chunk -> embed -> upsert pipeline both run on the ingestion
+    workers from that single local copy; progress can be followed through the job status
+    endpoint using the returned job_id.
+    Uploads are fingerprinted with SHA-256: if the user's namespace already holds an indexed copy
+    of the same content, the pipeline is skipped and the existing pdf_id is returned instead; if a
+    copy is still being ingested, its job is returned rather than starting a second ingestion.
+    Nothing is stored under the new name in either case, so the response's "filename" names the
+    existing copy; clients must use it (not the name they uploaded) to fetch the document.
+    Re-uploading changed content under an existing filename only embeds the chunks that changed.
     """
     temp_file_path = None
     username = current_user.username
     try:
-        contents = await file.read()
-        s3_key = await upload_to_s3(contents, username=username, filename=file.filename, content_type=file.content_type)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            temp_file_path = temp_file.name
-            s3_client.download_fileobj(
-                Bucket=S3_BUCKET_NAME,
-                Key=s3_key,
-                Fileobj=temp_file
+        temp_file_path, content_hash = await spool_upload(file)
+        s3_key = get_s3_key(username, file.filename)
+
+        existing = get_indexed_document_by_hash(db, username, content_hash)
+        if existing is not None:
+            logging.info(f"Upload {s3_key} duplicates {existing.pdf_id}, skipping ingestion")
+            job = IngestionJob(username=username, kind="pdf", source=existing.pdf_id)
+            job.chunks_total = job.chunks_embedded = job.chunks_upserted = existing.chunk_count
+            job.result = {
+                "chunks_processed": 0,
+                "s3_key": existing.pdf_id,
+                "filename": get_filename(username, existing.pdf_id),
+                "deduplicated": True
+            }
+            job.set_stage("completed")
+            await job_queue.record(job)
+            return JSONResponse(
+                content={
+                    "message": "Document already indexed, reusing the existing copy.",
+                    "job_id": job.job_id,
+                    "s3_key": existing.pdf_id,
+                    "filename": get_filename(username, existing.pdf_id),
+                    "deduplicated": True
+                },
+                status_code=200
             )
 
-        logging.info(f"Temporary file created at: {temp_file_path}")
+        in_flight = get_indexed_document_by_hash(db, username, content_hash, status="processing")
+        # The job may run on another web worker, so look it up in the database.
+        in_flight_job = get_active_job(db, username, in_flight.pdf_id) if in_flight is not None else None
+        if in_flight_job is not None:
+            logging.info(f"Upload {s3_key} duplicates {in_flight.pdf_id}, which is still being ingested")
+            return JSONResponse(
+                content={
+                    "message": "The same document is already being processed.",
+                    "job_id": in_flight_job["job_id"],
+                    "s3_key": in_flight.pdf_id,
+                    "filename": get_filename(username, in_flight.pdf_id),
+                    "deduplicated": True
+                },
+                status_code=202
+            )
+
+        # Two ingestions of one file would diff against the same previous version and delete or
+        # reuse each other's vectors, so a re-upload waits until the running one has finished.
+        active_job = get_active_job(db, username, s3_key)
+        if active_job is not None:
+            logging.info(f"Upload {s3_key} rejected, job {active_job['job_id']} is still ingesting it")
+            return JSONResponse(
+                content={
+                    "error": "A previous upload of this file is still being processed. Try again once it has finished.",
+                    "job_id": active_job["job_id"],
+                    "s3_key": s3_key
+                },
+                status_code=409
+            )
+
+        # A re-upload under the same name is re-indexed incrementally against the previous version.
+        previous = get_document(db, username, s3_key)
+        previous_version = (previous.content_hash, previous.chunk_count) if previous is not None and previous.status == "indexed" else None
+
+        job = IngestionJob(username=username, kind="pdf", source=s3_key)
+        await job_queue.submit(job, ingest_pdf, temp_file_path, s3_key, username, content_hash, file.content_type, previous_version)
+        # The ingestion job now owns the temporary file and removes it when it finishes.
+        temp_file_path = None
+        save_document(db, username, s3_key, content_hash, status="processing")
+        invalidate_document_caches(username, s3_key)
+
+        return JSONResponse(
+            content={
+                "message": "File uploaded and queued for processing!",
+                "job_id": job.job_id,
+                "s3_key": s3_key,
+                "filename": file.filename,
+                "queue_depth": job_queue.depth()
+            },
+            status_code=202
+        )
+
+    except QueueFullError as e:
+        logging.error(f"Upload rejected: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=503)
+    except Exception as e:
+        logging.error(f"Upload error: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+            logging.info(f"Temporary file deleted: {temp_file_path}")
+
+
+def get_vector_prefix(s3_key: str) -> str:
+    return hashlib.sha256(s3_key.encode("utf-8")).hexdigest()[:16] + "-"
+
+
+async def list_uuid_vector_ids(index, username: str, s3_key: str) -> List[str]:
+    """
+    Vector ids of a document indexed before chunk manifests existed, when every chunk got the
+    id f"{s3_key}-{uuid4()}". The uuid check keeps e.g. "report.pdf-2.pdf" out of "report.pdf-".
+    """
+    prefix = f"{s3_key}-"
+    try:
+        ids = await list_vector_ids(index, prefix, namespace=username)
+    except Exception as e:
+        # Listing by prefix is only available on serverless indexes.
+        logging.error(f"Listing legacy vectors of {s3_key} failed, they are left in place: {str(e)}")
+        return []
+    return [vector_id for vector_id in ids if _UUID.fullmatch(vector_id[len(prefix):])]
 
-        parsed_md_text = pymupdf4llm.to_markdown(temp_file_path)
-        created_chunks = chunker.chunk(parsed_md_text)
-        chunked_texts = [chunk.text for chunk in created_chunks]
-        text_embeddings = embeddings.embed_documents(chunked_texts)
 
-        index = pc.Index(index_name)
+def make_vector_id(s3_key: str, content_hash: str, chunk_index: int) -> str:
+    """
+    Vector id of a chunk: scoped to the document (hash of its S3 key) and to the version it was
+    first embedded in, so the same bytes uploaded under another name never share or overwrite
+    vectors, and kept chunks of an earlier version never collide with new ones.
+    """
+    return f"{get_vector_prefix(s3_key)}{content_hash[:16]}-{chunk_index}"
+
+
+async def ingest_pdf(job: IngestionJob, temp_file_path: str, s3_key: str, username: str, content_hash: str,
+                     content_type: str = None, previous_version: Tuple[str, int] = None):
+    """
+    Runs on an ingestion worker: uploads the spooled PDF to S3 while streaming it through
+    parse -> chunk -> embed -> upsert, so page batches are embedded and upserted as soon as they are parsed.
+    The PDF identifier is stored in the metadata as 'pdf_id' (using the S3 key) for later filtering.
+    Vector IDs are derived from the document, the content hash and the chunk index (make_vector_id),
+    so re-ingesting the same file overwrites its own vectors instead of duplicating them, and
+    identical bytes under another name get vectors of their own.
+    When the document was indexed before, chunks are diffed by content hash against its stored manifest:
+    unchanged chunks keep their vectors, new or changed chunks are embedded and upserted, and chunks
+    that disappeared are deleted from Pinecone. A document indexed before manifests were kept has its
+    old uuid-id vectors found by prefix and deleted once the new version is in place. If ingestion
+    fails, the vectors it had already written are deleted again and the previous version is left as is.
+    Parsing runs page-parallel on a process pool and other blocking library calls are pushed to threads,
+    so the event loop keeps serving requests.
+    """
+    # Ingestion runs on a queue worker, outside the upload request; label its stage timings explicitly.
+    current_endpoint.set("/api/docs/upload-doc")
+
+    # Concurrent uploads of one file can both get past the check in upload_doc; only the oldest runs.
+    if await asyncio.to_thread(is_superseded, username, s3_key, job.job_id):
+        os.remove(temp_file_path)
+        raise RuntimeError("Another upload of this file is still being processed")
+
+    def upload_to_s3():
+        with stage_timer("s3"):
+            upload_file_to_s3(temp_file_path, s3_key, content_type)
+
+    s3_upload = asyncio.create_task(asyncio.to_thread(upload_to_s3))
+    index = None
+    upserter = None
+    # Vectors written by this run that no earlier version owns; removed again if ingestion fails.
+    new_ids: List[str] = []
+    try:
+        index = get_index()
+
+        previous_chunks = await asyncio.to_thread(get_chunk_manifest, username, s3_key)
+        # Ids from before document-scoped ids (<content_hash>-<chunk_index>) may have been taken over
+        # by another upload of the same bytes; only the ones still labelled with this document are reused.
+        vector_prefix = get_vector_prefix(s3_key)
+        legacy_ids = [chunk.vector_id for chunk in previous_chunks if not chunk.vector_id.startswith(vector_prefix)]
+        owned_legacy_ids = set(await filter_owned_vectors(index, legacy_ids, username, s3_key)) if legacy_ids else set()
+        reusable: Dict[str, List[Tuple[str, int]]] = {}
+        for chunk in previous_chunks:
+            if not chunk.vector_id.startswith(vector_prefix) and chunk.vector_id not in owned_legacy_ids:
+                continue
+            reusable.setdefault(chunk.chunk_hash, []).append((chunk.vector_id, chunk.chunk_index))
+        stale_ids = {chunk.vector_id for chunk in previous_chunks}
+        if not previous_chunks:
+            # Indexed before chunk manifests were kept: its vectors have uuid ids, or follow the
+            # <content_hash>-<chunk_index> scheme when the document row remembers the version.
+            stale_ids = set(await list_uuid_vector_ids(index, username, s3_key))
+            if previous_version is not None:
+                previous_hash, previous_count = previous_version
+                stale_ids.update(f"{previous_hash}-{idx}" for idx in range(previous_count or 0))
+        previous_ids = {chunk.vector_id for chunk in previous_chunks}
+        moved_chunks = []
+
+        def reuse_vector(idx, chunk_hash):
+            candidates = reusable.get(chunk_hash)
+            if not candidates:
+                return None
+            vector_id, previous_idx = candidates.pop(0)
+            if previous_idx != idx:
+                moved_chunks.append((vector_id, {"chunk_index": idx}))
+            return vector_id
+
         # Each vector now includes a 'pdf_id' field in metadata for filtering during queries.
-        vectors_to_add = [
-            {
-                "id": f"{s3_key}-{uuid.uuid4()}",
+        def build_vector(idx, text, vector):
+            vector_id = make_vector_id(s3_key, content_hash, idx)
+            if vector_id not in previous_ids:
+                new_ids.append(vector_id)
+            return {
+                "id": vector_id,
                 "values": vector,
                 "metadata": {
                     "pdf_id": s3_key,        # new metadata field
                     "source": s3_key,
-                    "text": chunked_texts[idx],
+                    "content_hash": content_hash,
+                    "text": text,
                     "chunk_index": idx
                 }
             }
-            for idx, vector in enumerate(text_embeddings)
-        ]
 
-        batch_size = 200
-        for batch in batch_iterable(vectors_to_add, batch_size):
-            index.upsert(vectors=batch, namespace=username)
+        def on_progress(count):
+            job.chunks_upserted += count
 
-        return JSONResponse(
-            content={
-                "message": "File uploaded and processed successfully!",
-                "chunks_processed": len(chunked_texts),
-                "s3_key": s3_key
-            },
-            status_code=200
+        bm25_builder = BM25IndexBuilder() if HYBRID_RETRIEVAL_ENABLED else None
+        upserter = PineconeUpserter(index, namespace=username, on_progress=on_progress)
+        manifest = await run_ingestion_pipeline(
+            iter_markdown_batches(temp_file_path), build_vector, upserter, job=job, reuse_vector=reuse_vector,
+            on_chunk=bm25_builder.add if bm25_builder is not None else None
         )
+        upsert_stats = upserter.stats()
+
+        kept_ids = {vector_id for _, vector_id in manifest}
+        removed_ids = [vector_id for vector_id in stale_ids if vector_id not in kept_ids and vector_id.startswith(vector_prefix)]
+        legacy_removed = [vector_id for vector_id in stale_ids if vector_id not in kept_ids and not vector_id.startswith(vector_prefix)]
+        if legacy_removed:
+            removed_ids += await filter_owned_vectors(index, legacy_removed, username, s3_key)
+        await update_vector_metadata(index, moved_chunks, namespace=username)
+        await delete_vectors(index, removed_ids, namespace=username)
+        if previous_chunks or previous_version is not None:
+            logging.info(
+                f"Re-indexed {s3_key}: {job.chunks_reused} chunks unchanged, {job.chunks_embedded} embedded, "
+                f"{len(removed_ids)} removed"
+            )
 
-    except Exception as e:
-        logging.error(f"Upload error: {str(e)}")
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+        await s3_upload
+        logging.info(f"Uploaded {temp_file_path} to S3 as {s3_key}")
+        if bm25_builder is not None:
+            bm25_index = bm25_builder.build([vector_id for _, vector_id in manifest], version=content_hash)
+            try:
+                await asyncio.to_thread(save_bm25_index, bm25_index, get_bm25_key(s3_key))
+            except Exception as e:
+                # Queries fall back to dense-only retrieval for this document.
+                logging.error(f"Saving BM25 index of {s3_key} failed: {str(e)}")
+        await asyncio.to_thread(replace_chunk_manifest, username, s3_key, manifest)
+        await asyncio.to_thread(set_document_status, username, s3_key, content_hash, "indexed", len(manifest))
+        invalidate_document_caches(username, s3_key)
+
+        job.result = {
+            "chunks_processed": len(manifest),
+            "chunks_reused": job.chunks_reused,
+            "chunks_removed": len(removed_ids),
+            "s3_key": s3_key,
+            "filename": get_filename(username, s3_key),
+            "upsert_vectors_per_sec": round(upsert_stats["vectors_per_sec"], 1)
+        }
+    except Exception:
+        await asyncio.to_thread(set_document_status, username, s3_key, content_hash, "failed")
+        if new_ids:
+            try:
+                # Let in-flight batches land first so none of them is written after the delete.
+                await upserter.flush()
+            except Exception:
+                pass
+            try:
+                await delete_vectors(index, new_ids, namespace=username)
+                logging.info(f"Removed {len(new_ids)} vectors of the failed ingestion of {s3_key}")
+            except Exception as e:
+                logging.error(f"Removing vectors of the failed ingestion of {s3_key} failed: {str(e)}")
+        raise
     finally:
-        if temp_file_path and os.path.exists(temp_file_path):
+        # The S3 thread reads the same local file, so let it finish before the file is removed.
+        await asyncio.gather(s3_upload, return_exceptions=True)
+        if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
-            logging.info(f"Temporary file deleted: {temp_file_path}")         
-            
+            logging.info(f"Temporary file deleted: {temp_file_path}")
+
+
+async def get_upload_status(job_id: str, current_user: UserPDF, db: Session):
+    """
+    Reports the stage, chunk counts and any failure of an ingestion job owned by the current user.
+    Jobs running on this worker are reported live; the others from their last saved state.
+    """
+    job = job_queue.get(job_id)
+    if job is not None and job.username == current_user.username:
+        return JSONResponse(content=job.to_dict(), status_code=200)
+    state = get_job(db, current_user.username, job_id)
+    if state is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=state, status_code=200)
+
+async def get_cache_stats():
+    """
+    Reports hit/miss counters of the retrieval caches, plus OpenAI embedding batch latency
+    reranker latency/fallbacks and LLM call latency/token counts per provider.
+    """
+    embedding_cache = get_embedding_cache()
+    embedding_executor = get_embedding_executor()
+    return JSONResponse(
+        content={
+            "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
+            "embedding_executor": embedding_executor.stats() if embedding_executor is not None else None,
+            "vector_cache": vector_cache.stats() if vector_cache is not None else None,
+            "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+            "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+            "reranker": reranker.stats(),
+            "bm25_indexes": bm25_indexes.stats(),
+            "llm": llm_gateway.stats(),
+            "context": context_packer.stats()
+        },
+        status_code=200
+    )
+
 async def get_doc_helper(filename: str, current_user: UserPDF):
     try:
         # Construct the S3 key based on the pattern used in upload_to_s3
@@ -303,17 +909,19 @@ async def get_doc_helper(filename: str, current_user: UserPDF):
         )
     
 
-async def delete_namespace_vectors_and_pdfs(current_user: UserPDF):
+async def delete_namespace_vectors_and_pdfs(current_user: UserPDF, db: Session):
     """
     Deletes all vectors in the Pinecone index for the current user's namespace,
-    and deletes all PDF objects stored in the S3 bucket under the user's folder.
+    deletes all PDF objects stored in the S3 bucket under the user's folder,
+    and forgets the user's document fingerprints.
     """
     username = current_user.username
     try:
         # Delete all vectors in the user's namespace from Pinecone.
-        index = pc.Index(index_name)
+        index = get_index()
         delete_response = index.delete(delete_all=True, namespace=username)
         logging.info(f"Deleted vectors for namespace '{username}', response: {delete_response}")
+        invalidate_document_caches(username)
 
         # Delete S3 objects in the user's folder.
         # This example assumes that all PDFs are stored under a folder named with the username.
@@ -326,6 +934,9 @@ async def delete_namespace_vectors_and_pdfs(current_user: UserPDF):
         else:
             logging.info(f"No S3 objects found with prefix '{prefix}'.")
 
+        deleted_documents = delete_documents(db, username)
+        logging.info(f"Deleted {deleted_documents} document records for '{username}'.")
+
         return JSONResponse(
             content={"message": f"All vectors in namespace '{username}' and associated PDFs in S3 have been deleted."},
             status_code=200
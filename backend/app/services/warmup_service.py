@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from app.config import WARMUP_STEP_TIMEOUT
+from app.database import engine
+from app.utils.embedding_utils import get_chunker, get_embeddings, get_embedding_executor, get_index
+from app.utils.pdf_utils import warm_parse_executor
+from app.utils.rerank_utils import reranker
+from app.utils.llm_gateway import llm_gateway
+from app.utils.context_packer import count_tokens
+
+SAMPLE_TEXT = (
+    "Warmup sentence one. The worker primes its models and connections before taking traffic. "
+    "Warmup sentence three."
+)
+
+
+class WarmupState:
+    """Progress of the worker warmup; /ready reports it and answers 200 once `ready` is set."""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "duration_ms": round((self.finished_at - self.started_at) * 1000) if self.finished_at else None,
+            "steps": self.steps,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _warm_chunker():
+    get_chunker().chunk(SAMPLE_TEXT)
+
+
+async def _warm_embeddings():
+    embeddings = await asyncio.to_thread(get_embeddings)
+    executor = get_embedding_executor()
+    if executor is not None:
+        await executor.warm_up()
+    else:
+        await embeddings.aembed_query(SAMPLE_TEXT)
+
+
+def _warm_tokenizer():
+    count_tokens(SAMPLE_TEXT)
+
+
+def _warm_pinecone():
+    get_index().describe_index_stats()
+
+
+def _warm_db_pool():
+    # Check out a full pool's worth of connections at once so they are all open before traffic.
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def _warm_groq():
+    await llm_gateway.warm_up("groq")
+
+
+async def _warm_openai():
+    await llm_gateway.warm_up("openai")
+
+
+WARMUP_STEPS: Dict[str, Callable[[], Any]] = {
+    "chunker": _warm_chunker,
+    "embeddings": _warm_embeddings,
+    "tokenizer": _warm_tokenizer,
+    "pinecone": _warm_pinecone,
+    "database": _warm_db_pool,
+    "groq": _warm_groq,
+    "openai": _warm_openai,
+    "reranker": reranker.warm_up,
+    "pdf_parse_pool": warm_parse_executor,
+}
+
+
+async def _run_step(name: str, step: Callable[[], Any]):
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            awaitable: Awaitable = step()
+        else:
+            awaitable = asyncio.to_thread(step)
+        await asyncio.wait_for(awaitable, timeout=WARMUP_STEP_TIMEOUT)
+        warmup_state.steps[name] = {"status": "ok"}
+    except Exception as e:
+        # A failed step is reported but does not hold the worker back: the request path
+        # initializes the same clients lazily and surfaces the error there.
+        error = str(e) or type(e).__name__
+        logging.error(f"Warmup step '{name}' failed: {error}")
+        warmup_state.steps[name] = {"status": "failed", "error": error}
+    warmup_state.steps[name]["duration_ms"] = round((time.perf_counter() - started) * 1000)
+
+
+async def run_warmup():
+    """
+    Primes everything the first requests would otherwise pay for: the chunker model, the
+    embedding client, the shared Pinecone gRPC channel, the DB connection pool, TLS connections
+    to Groq/OpenAI/Jina and the PDF parse processes. Steps run concurrently; the worker is marked
+    ready once all of them have finished.
+    """
+    warmup_state.started_at = time.perf_counter()
+    warmup_state.steps = {name: {"status": "running"} for name in WARMUP_STEPS}
+    await asyncio.gather(*[_run_step(name, step) for name, step in WARMUP_STEPS.items()])
+    warmup_state.finished_at = time.perf_counter()
+    warmup_state.ready = True
+    logging.info(f"Warmup finished in {(warmup_state.finished_at - warmup_state.started_at) * 1000:.0f} ms")
+
+
+def mark_ready():
+    """Used when warmup is disabled."""
+    warmup_state.ready = True
@@ -5,13 +5,28 @@ from fastapi.responses import JSONResponse
 from youtube_transcript_api import YouTubeTranscriptApi
 
 # External dependencies from your project
-from app.utils.embedding_utils import embeddings, chunker, pc, index_name
-from app.utils.helpers_utils import batch_iterable
+from app.utils.embedding_utils import get_embeddings, get_index
+from app.utils.upsert_utils import PineconeUpserter
+from app.utils.ingestion_pipeline import run_ingestion_pipeline, iter_texts
 from app.utils.rerank_utils import rerank_documents
-from app.config import GROQ_API_KEY, OPENAI_API_KEY
+from app.utils.prompt_utils import get_prompt
+from app.utils.sse_utils import sse_response
+from app.utils.llm_gateway import llm_gateway
+from app.utils.context_packer import context_packer, get_token_budget
+from app.utils.metrics import stage_timer
+from app.utils.bm25 import BM25IndexBuilder
+from app.utils.hybrid_utils import (
+    bm25_indexes, get_youtube_bm25_key, save_bm25_index, reciprocal_rank_fusion, fetch_texts
+)
+import asyncio
+from app.config import HYBRID_RETRIEVAL_ENABLED, CONTEXT_MAX_PASSAGES
 from app.models import UserPDF
-from groq import Groq
-from langchain import hub
+
+prompt = get_prompt("rag_prompt")
+
+# Transcript chunks retrieved per question before reranking; the reranker keeps fewer than this.
+RETRIEVAL_TOP_K = 20
+
 
 def extract_video_id(youtube_url: str) -> str:
     """
@@ -71,8 +86,8 @@ async def process_upload_youtube_transcript(youtube_url: str, current_user: User
     1. Extract the video ID.
     2. Retrieve and translate the transcript.
     3. Chunk the transcript text.
-    4. Generate embeddings for each chunk.
-    5. Upsert the vectors into a Pinecone index under the user's namespace.
+    4. Generate embeddings for each batch of chunks.
+    5. Upsert each batch into a Pinecone index under the user's namespace as soon as it is embedded.
     """
     try:
         username = current_user.username
@@ -84,45 +99,44 @@ async def process_upload_youtube_transcript(youtube_url: str, current_user: User
                 status_code=400
             )
 
-        transcript_text = transcribe_and_translate(youtube_url)
+        transcript_text = await asyncio.to_thread(transcribe_and_translate, youtube_url)
         if transcript_text.startswith("Error:"):
             return JSONResponse(
                 content={"error": transcript_text},
                 status_code=500
             )
 
-        # Chunk the transcript into smaller pieces.
-        chunks = chunker.chunk(transcript_text)
-        chunked_texts = [chunk.text for chunk in chunks]
-
-        # Generate embeddings for each chunk.
-        text_embeddings = embeddings.embed_documents(chunked_texts)
-
-        # Prepare vectors for upsert.
-        index = pc.Index(index_name)
-        vectors_to_add = [
-            {
+        # Chunk, embed and upsert the transcript as a stream of batches.
+        def build_vector(idx, text, vector):
+            return {
                 "id": f"{video_id}-{uuid.uuid4()}",
                 "values": vector,
                 "metadata": {
                     "video_id": video_id,
                     "source": youtube_url,
-                    "text": chunked_texts[idx],
+                    "text": text,
                     "chunk_index": idx
                 }
             }
-            for idx, vector in enumerate(text_embeddings)
-        ]
 
-        # Upsert vectors in batches.
-        batch_size = 200
-        for batch in batch_iterable(vectors_to_add, batch_size):
-            index.upsert(vectors=batch, namespace=f"{username}_youtube")
+        bm25_builder = BM25IndexBuilder() if HYBRID_RETRIEVAL_ENABLED else None
+        upserter = PineconeUpserter(get_index(), namespace=f"{username}_youtube")
+        manifest = await run_ingestion_pipeline(
+            iter_texts(transcript_text), build_vector, upserter,
+            on_chunk=bm25_builder.add if bm25_builder is not None else None
+        )
+        if bm25_builder is not None:
+            bm25_key = get_youtube_bm25_key(username, video_id)
+            try:
+                await asyncio.to_thread(save_bm25_index, bm25_builder.build([vector_id for _, vector_id in manifest]), bm25_key)
+                bm25_indexes.invalidate(bm25_key)
+            except Exception as e:
+                logging.error(f"Saving BM25 index for video {video_id} failed: {str(e)}")
 
         return JSONResponse(
             content={
                 "message": "YouTube transcript uploaded and processed successfully!",
-                "chunks_processed": len(chunked_texts),
+                "chunks_processed": len(manifest),
                 "video_id": video_id
             },
             status_code=200
@@ -132,6 +146,81 @@ async def process_upload_youtube_transcript(youtube_url: str, current_user: User
         logging.error(f"Error uploading YouTube transcript: {str(e)}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+async def build_youtube_messages(query: str, video_id: str, username: str) -> list:
+    """
+    Retrieves and re-ranks transcript chunks for the query and builds the chat messages for the LLM.
+
+    Args:
+        query (str): The user’s query.
+        video_id (str): The YouTube video ID to filter transcripts (optional).
+        username (str): Owner of the transcript namespace.
+
+    Returns:
+        list: The system and user messages.
+    """
+    # Construct the system message for context.
+    system_message = (
+        "You are an AI assistant that answers questions using context derived from YouTube "
+        "video transcripts. The context is based on processed, chunked, and embedded transcript data. "
+        "Answer solely based on the provided context. If details are insufficient, state that you don't have enough information."
+    )
+
+    # Embed the query.
+    with stage_timer("embed"):
+        query_vector = await get_embeddings().aembed_query(query)
+    index = get_index()
+
+    # Optional filtering by video_id.
+    filter_dict = {"video_id": video_id} if video_id else None
+
+    with stage_timer("retrieve"):
+        fetch_result = await asyncio.to_thread(
+            index.query,
+            vector=query_vector,
+            top_k=RETRIEVAL_TOP_K,
+            include_metadata=True,
+            namespace=f"{username}_youtube",
+            filter=filter_dict
+        )
+
+    # Extract texts from the matched chunks.
+    texts = {match.id: match.metadata["text"] for match in fetch_result.matches}
+    retrieved_texts = list(texts.values())
+
+    # With a single video, fuse in its lexical matches so exact terms are not missed.
+    bm25_index = None
+    if HYBRID_RETRIEVAL_ENABLED and video_id:
+        bm25_index = await bm25_indexes.get(get_youtube_bm25_key(username, video_id))
+    if bm25_index is not None:
+        lexical_ids = [vector_id for vector_id, _ in bm25_index.search(query, RETRIEVAL_TOP_K)]
+        ranked_ids = reciprocal_rank_fusion(list(texts), lexical_ids)[:RETRIEVAL_TOP_K]
+        texts.update(await fetch_texts(
+            index, f"{username}_youtube", [vector_id for vector_id in ranked_ids if vector_id not in texts]
+        ))
+        retrieved_texts = [texts[vector_id] for vector_id in ranked_ids if vector_id in texts]
+
+    # Re-rank the retrieved documents for better relevance.
+    with stage_timer("rerank"):
+        reranked_docs = await rerank_documents(query, retrieved_texts, top_n=min(CONTEXT_MAX_PASSAGES, RETRIEVAL_TOP_K - 1))
+
+    # Drop overlapping chunks and keep the context within the model's token budget.
+    packed = context_packer.pack([doc['document']['text'] for doc in reranked_docs], get_token_budget("llama-3.3-70b-versatile"))
+
+    # Prepare the final prompt.
+    formatted_system_message = (
+        f"{system_message} Use the following context to answer the question and make sure to cover every aspect of the question. "
+    )
+    formatted_prompt = prompt.format(context=packed.text, question=query)
+
+    messages = [
+        {"role": "system", "content": formatted_system_message},
+        {"role": "user", "content": formatted_prompt}
+    ]
+    prompt_tokens = context_packer.record_prompt(messages)
+    logging.info(f"Prompt tokens: {prompt_tokens} (context {packed.tokens}, {len(packed.passages)} passages)")
+    return messages
+
+
 async def generate_response_youtube_url_query(query: str, video_id: str, current_user: UserPDF) -> JSONResponse:
     """
     Generates an answer for a query using the processed YouTube transcript data stored in Pinecone.
@@ -151,59 +240,15 @@ async def generate_response_youtube_url_query(query: str, video_id: str, current
         JSONResponse: A response containing the generated answer.
     """
     try:
-        username = current_user.username
-
-        # Construct the system message for context.
-        system_message = (
-            "You are an AI assistant that answers questions using context derived from YouTube "
-            "video transcripts. The context is based on processed, chunked, and embedded transcript data. "
-            "Answer solely based on the provided context. If details are insufficient, state that you don't have enough information."
-        )
-
-        # Embed the query.
-        query_vector = embeddings.embed_query(query)
-        index = pc.Index(index_name)
-
-        # Optional filtering by video_id.
-        filter_dict = {"video_id": video_id} if video_id else None
-
-        fetch_result = index.query(
-            vector=query_vector,
-            top_k=20,
-            include_metadata=True,
-            namespace=f"{username}_youtube",
-            filter=filter_dict
-        )
-
-        # Extract texts from the matched chunks.
-        retrieved_texts = [match.metadata["text"] for match in fetch_result.matches]
-
-        # Re-rank the retrieved documents for better relevance.
-        reranked_docs = await rerank_documents(query, retrieved_texts)
-        context = " ".join([doc['document']['text'] for doc in reranked_docs])
-
-        # Prepare the final prompt.
-        formatted_system_message = (
-            f"{system_message} Use the following context to answer the question and make sure to cover every aspect of the question. "
-        )
-        prompt_template = hub.pull("rlm/rag-prompt")
-        formatted_prompt = prompt_template.format(context=context, question=query)
+        messages = await build_youtube_messages(query, video_id, current_user.username)
 
-        # Initialize the Groq client and generate a completion.
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": formatted_system_message},
-                {"role": "user", "content": context}
-            ],
+        response_content = await llm_gateway.chat(
+            messages=messages,
             model="llama-3.3-70b-versatile",
             max_tokens=4096,
-            temperature=0.7,
-            stream=False
+            temperature=0.7
         )
 
-        response_content = chat_completion.choices[0].message.content
-
         return JSONResponse(
             content={
                 "message": "YouTube query response generated successfully!",
@@ -217,8 +262,35 @@ async def generate_response_youtube_url_query(query: str, video_id: str, current
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+async def generate_response_youtube_url_query_stream(query: str, video_id: str, current_user: UserPDF):
+    """
+    Streaming variant of generate_response_youtube_url_query: the answer is sent token by token
+    over Server-Sent Events.
+
+    Args:
+        query (str): The user’s query.
+        video_id (str): The YouTube video ID to filter transcripts (optional).
+        current_user (UserPDF): The authenticated user.
+
+    Returns:
+        StreamingResponse: A text/event-stream of token, done and error events.
+    """
+    try:
+        messages = await build_youtube_messages(query, video_id, current_user.username)
+        tokens = llm_gateway.stream_chat(
+            messages=messages,
+            model="llama-3.3-70b-versatile",
+            max_tokens=4096,
+            temperature=0.7
+        )
+        return sse_response(tokens)
+
+    except Exception as e:
+        logging.error(f"Error generating YouTube query response: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
 
-def generate_video_summary(youtube_url: str, current_user: UserPDF) -> JSONResponse:
+async def generate_video_summary(youtube_url: str, current_user: UserPDF) -> JSONResponse:
     """
     Generates a summary of the entire YouTube video transcript.
     
@@ -238,7 +310,7 @@ def generate_video_summary(youtube_url: str, current_user: UserPDF) -> JSONRespo
     """
     try:
 
-        transcript_text = transcribe_and_translate(youtube_url)
+        transcript_text = await asyncio.to_thread(transcribe_and_translate, youtube_url)
         if transcript_text.startswith("Error:"):
             return JSONResponse(
                 content={"error": transcript_text},
@@ -252,18 +324,15 @@ def generate_video_summary(youtube_url: str, current_user: UserPDF) -> JSONRespo
             f"{transcript_text}"
         )
 
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        chat_completion = groq_client.chat.completions.create(
+        summary_text = await llm_gateway.chat(
             messages=[
                 {"role": "system", "content": "You are a video summarization assistant."},
                 {"role": "user", "content": summarization_prompt}
             ],
             model="llama-3.3-70b-versatile",
             max_tokens=512,
-            temperature=0.5,
-            stream=False
+            temperature=0.5
         )
-        summary_text = chat_completion.choices[0].message.content
 
         return JSONResponse(
             content={
@@ -0,0 +1,94 @@
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.config import ANSWER_CACHE_ENABLED, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, Unicode form, whitespace and trailing punctuation do not change the answer."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return _WHITESPACE.sub(" ", query).strip().rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Exact-match cache of generated answers with a TTL and LRU eviction by entry count.
+    Keys cover the namespace, pdf_id, document version, normalized query and the effective system
+    message; entries also remember (namespace, pdf_id) so a document's answers can be invalidated.
+    Each entry keeps the time it took to produce, so hits add up to the latency saved.
+    `generation` changes on every invalidation; callers read it before generating an answer and
+    skip the put if it moved, so an answer started before an invalidation is never stored after it.
+    Used from the event loop only.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        self.generation = 0
+        # key -> (expires_at, namespace, pdf_id, answer, compute_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, str, str, str, float]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(namespace: str, pdf_id: str, content_hash: Optional[str], query: str, system_message: str) -> str:
+        parts = [namespace, pdf_id, content_hash or "", normalize_query(query), system_message]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, _, answer, compute_seconds = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.seconds_saved += compute_seconds
+        return answer
+
+    def put(self, key: str, namespace: str, pdf_id: str, answer: str, compute_seconds: float):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, namespace, pdf_id, answer, compute_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, namespace: str, pdf_id: Optional[str] = None):
+        """Drops the answers of one document, or of every document in a namespace when pdf_id is None."""
+        self.generation += 1
+        for key in [
+            key for key, (_, entry_namespace, entry_pdf_id, _, _) in self._entries.items()
+            if entry_namespace == namespace and (pdf_id is None or entry_pdf_id == pdf_id)
+        ]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "seconds_saved": round(self.seconds_saved, 3),
+        }
+
+
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import os
+import shutil
+from typing import Tuple
+
+from fastapi import UploadFile, HTTPException, status
+
+from app.config import (
+    AUDIO_MAX_BYTES,
+    AUDIO_TRANSCODE_ENABLED,
+    AUDIO_TRANSCODE_MIN_BYTES,
+    AUDIO_TRANSCODE_BITRATE,
+    AUDIO_TRANSCODE_TIMEOUT_SECONDS,
+)
+
+FFMPEG = shutil.which("ffmpeg")
+
+
+async def read_audio_upload(audio_file: UploadFile) -> Tuple[str, bytes]:
+    """
+    Reads an uploaded clip into memory as (filename, bytes). Starlette already spools the upload,
+    so nothing is written to a shared path and concurrent requests cannot clash.
+    """
+    data = await audio_file.read(AUDIO_MAX_BYTES + 1)
+    if len(data) > AUDIO_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Audio file exceeds {AUDIO_MAX_BYTES // (1024 * 1024)} MB"
+        )
+    filename = os.path.basename(audio_file.filename or "") or "audio.mp3"
+    if not os.path.splitext(filename)[1]:
+        # Whisper infers the container from the extension.
+        filename = f"{filename}.mp3"
+    return filename, data
+
+
+async def compact_audio(filename: str, data: bytes) -> Tuple[str, bytes]:
+    """
+    Transcodes a large clip to 16 kHz mono Opus, which is all speech recognition needs, so less
+    has to be uploaded to Whisper. Small clips, and any clip ffmpeg cannot handle, are returned as is.
+    """
+    if not AUDIO_TRANSCODE_ENABLED or FFMPEG is None or len(data) < AUDIO_TRANSCODE_MIN_BYTES:
+        return filename, data
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+        "-vn", "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", AUDIO_TRANSCODE_BITRATE,
+        "-application", "voip", "-f", "ogg", "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        output, error = await asyncio.wait_for(process.communicate(data), timeout=AUDIO_TRANSCODE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logging.error(f"Transcoding {filename} timed out, sending the original")
+        return filename, data
+    except OSError as e:
+        # ffmpeg exits before reading all input when it cannot parse the container.
+        await process.wait()
+        logging.error(f"Transcoding {filename} failed, sending the original: {str(e)}")
+        return filename, data
+    if process.returncode != 0 or not output:
+        logging.error(f"Transcoding {filename} failed, sending the original: {error.decode(errors='replace').strip()}")
+        return filename, data
+    logging.info(f"Transcoded {filename}: {len(data)} -> {len(output)} bytes")
+    return f"{os.path.splitext(filename)[0]}.ogg", output
@@ -0,0 +1,118 @@
+import gzip
+import json
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps identifiers such as "4.2.1", "ABC-123" or "a/b" together as one token.
+_TOKEN = re.compile(r"\w+(?:[.\-/]\w+)*")
+_PART = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. Compound identifiers are kept whole and also split into their parts,
+    so "ABC-123" matches a query for "abc-123" exactly and a query for "abc" partially.
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+
+def bm25_scores(query: str, documents: List[str], k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """
+    BM25 score of every document for the query, treating the documents themselves as the corpus.
+    Meant for small candidate sets; term frequencies are gathered into a (documents x query terms)
+    matrix and scored in one vectorized pass.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not documents or not terms:
+        return np.zeros(len(documents), dtype=np.float32)
+    counts = [Counter(tokenize(document)) for document in documents]
+    tf = np.array([[count[term] for term in terms] for count in counts], dtype=np.float32)
+    lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1.0 + (len(documents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1.0 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    return ((tf * (k1 + 1.0)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+class BM25Index:
+    """
+    Inverted index over the chunks of one document. Each term maps to the chunk rows it occurs in
+    and its frequency there; rows map to Pinecone vector ids. `version` records the document
+    version (content hash) the index was built from.
+    """
+
+    def __init__(self, vector_ids: List[str], lengths: List[int], postings: Dict[str, Tuple[List[int], List[int]]],
+                 version: str = "", k1: float = BM25_K1, b: float = BM25_B):
+        self.vector_ids = vector_ids
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        average_length = max(float(self.lengths.mean()), 1.0) if len(self.lengths) else 1.0
+        self._norm = k1 * (1.0 - b + b * self.lengths / average_length)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Best matching chunks as (vector_id, score), best first; chunks sharing no term are left out."""
+        scores = np.zeros(len(self.vector_ids), dtype=np.float32)
+        for term in dict.fromkeys(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = np.log(1.0 + (len(self.vector_ids) - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + self._norm[rows])
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k)[:top_k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.vector_ids[row], float(scores[row])) for row in matched]
+
+    def to_bytes(self) -> bytes:
+        return gzip.compress(json.dumps({
+            "version": self.version,
+            "ids": self.vector_ids,
+            "lengths": self.lengths.astype(int).tolist(),
+            "postings": {term: [rows.tolist(), tfs.astype(int).tolist()] for term, (rows, tfs) in self.postings.items()},
+        }, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BM25Index":
+        payload = json.loads(gzip.decompress(data))
+        return cls(payload["ids"], payload["lengths"], payload["postings"], version=payload["version"])
+
+
+class BM25IndexBuilder:
+    """Collects term counts chunk by chunk during ingestion; build() pairs rows with the final vector ids."""
+
+    def __init__(self):
+        self._counts: Dict[int, Counter] = {}
+
+    def add(self, chunk_index: int, text: str):
+        self._counts[chunk_index] = Counter(tokenize(text))
+
+    def build(self, vector_ids: List[str], version: str = "") -> BM25Index:
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = []
+        for row in range(len(vector_ids)):
+            counts = self._counts.get(row, Counter())
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                rows, tfs = postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+        return BM25Index(vector_ids, lengths, postings, version=version)
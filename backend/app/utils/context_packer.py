@@ -0,0 +1,154 @@
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Set
+
+from app.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_BUDGETS,
+    CONTEXT_DEDUP_THRESHOLD,
+    CONTEXT_MIN_PASSAGE_TOKENS,
+)
+
+_WORD = re.compile(r"\w+")
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    tiktoken's cl100k_base as a stand-in for the Llama tokenizer (counts are within a few percent
+    on English text). If it cannot be loaded (its BPE file is downloaded on first use), token counts
+    fall back to a characters/4 estimate.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logging.error(f"Loading tokenizer failed, estimating token counts: {str(e)}")
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def get_token_budget(model: str) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET)
+
+
+def _shingles(text: str) -> Set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < 3:
+        return set(words)
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+class PackedContext:
+    def __init__(self, text: str, passages: List[str], indices: List[int], tokens: int, duplicates: int, dropped: int, trimmed: bool):
+        self.text = text
+        self.passages = passages
+        self.indices = indices
+        self.tokens = tokens
+        self.duplicates = duplicates
+        self.dropped = dropped
+        self.trimmed = trimmed
+
+
+class ContextPacker:
+    """
+    Assembles the context block of the RAG prompt from passages given best first. A passage is
+    skipped when most of its word trigrams already appear in a kept passage (repeated or
+    overlapping chunks); the rest are kept in relevance order until the token budget is spent,
+    and the passage that crosses the budget is cut to fit when enough room is left for it to be useful.
+    """
+
+    def __init__(self, dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD, min_passage_tokens: int = CONTEXT_MIN_PASSAGE_TOKENS):
+        self.dedup_threshold = dedup_threshold
+        self.min_passage_tokens = min_passage_tokens
+        self.packs = 0
+        self.context_tokens = 0
+        self.prompt_tokens = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.trimmed = 0
+
+    def _is_duplicate(self, shingles: Set[str], kept: List[Set[str]]) -> bool:
+        if not shingles:
+            return True
+        for other in kept:
+            overlap = len(shingles & other) / min(len(shingles), len(other) or 1)
+            if overlap >= self.dedup_threshold:
+                return True
+        return False
+
+    def pack(self, passages: List[str], budget: int, separator: str = "\n\n") -> PackedContext:
+        kept: List[str] = []
+        indices: List[int] = []
+        kept_shingles: List[Set[str]] = []
+        tokens = 0
+        duplicates = 0
+        dropped = 0
+        trimmed = False
+        separator_tokens = count_tokens(separator)
+        for position, passage in enumerate(passages):
+            passage = passage.strip()
+            shingles = _shingles(passage)
+            if self._is_duplicate(shingles, kept_shingles):
+                duplicates += 1
+                continue
+            cost = count_tokens(passage) + (separator_tokens if kept else 0)
+            if tokens + cost > budget:
+                room = budget - tokens - (separator_tokens if kept else 0)
+                if room >= self.min_passage_tokens:
+                    kept.append(trim_to_tokens(passage, room))
+                    indices.append(position)
+                    tokens += room + (separator_tokens if len(kept) > 1 else 0)
+                    trimmed = True
+                dropped += len(passages) - position - (1 if trimmed else 0)
+                break
+            kept.append(passage)
+            indices.append(position)
+            kept_shingles.append(shingles)
+            tokens += cost
+
+        self.packs += 1
+        self.context_tokens += tokens
+        self.duplicates += duplicates
+        self.dropped += dropped
+        self.trimmed += int(trimmed)
+        return PackedContext(separator.join(kept), kept, indices, tokens, duplicates, dropped, trimmed)
+
+    def record_prompt(self, messages: List[Dict[str, str]]) -> int:
+        """Counts and records the prompt tokens of the messages about to be sent."""
+        tokens = sum(count_tokens(message["content"]) for message in messages)
+        self.prompt_tokens += tokens
+        return tokens
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {
+            "packs": self.packs,
+            "avg_context_tokens": round(self.context_tokens / self.packs, 1) if self.packs else None,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.packs, 1) if self.packs else None,
+            "duplicates_dropped": self.duplicates,
+            "over_budget_dropped": self.dropped,
+            "trimmed": self.trimmed,
+        }
+
+
+context_packer = ContextPacker()
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+from app.config import (
+    EMBEDDING_MAX_BATCH_TOKENS,
+    EMBEDDING_MAX_BATCH_INPUTS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_TIMEOUT_SECONDS,
+)
+
+
+class TokenBucket:
+    """
+    Tokens-per-minute budget shared by all embedding requests. The refill rate is adjusted
+    multiplicatively: halved on every 429, then nudged back up towards the configured rate.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.max_rate = tokens_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: int):
+        # Requests larger than the whole budget are let through once the bucket is full.
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def slow_down(self):
+        self.rate = max(self.max_rate / 64, self.rate / 2)
+
+    def speed_up(self):
+        self.rate = min(self.max_rate, self.rate * 1.05)
+
+
+class EmbeddingExecutor:
+    """
+    Async OpenAI embedding client. Texts are packed into requests by token count, requests run
+    concurrently under a semaphore and a shared tokens-per-minute budget, and 429s, timeouts,
+    connection errors and 5xx responses are retried with backoff (429s also slow the budget down). Per-batch latency is kept for the stats endpoint.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        max_batch_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+        max_batch_inputs: int = EMBEDDING_MAX_BATCH_INPUTS,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        tokens_per_minute: int = EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        timeout: float = EMBEDDING_TIMEOUT_SECONDS
+    ):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._api_key = api_key
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._tokens_per_minute = tokens_per_minute
+        self._encoding = None
+        self._encoding_loaded = False
+        self.batches = 0
+        self.tokens = 0
+        self.rate_limited = 0
+        self.transient_errors = 0
+        self.batch_latencies: Deque[float] = deque(maxlen=1000)
+
+    def _ensure_started(self):
+        # Created on first use so the asyncio primitives bind to the running event loop.
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self._api_key, timeout=self.timeout, max_retries=0)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._bucket = TokenBucket(self._tokens_per_minute)
+
+    async def warm_up(self):
+        """Opens the pooled HTTPS connection to the API with a free model lookup."""
+        self._ensure_started()
+        await self._client.models.retrieve(self.model)
+
+    def count_tokens(self, text: str) -> int:
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except Exception as e:
+                logging.warning(f"tiktoken unavailable for {self.model}, estimating tokens from length: {e}")
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    def pack(self, texts: List[str]) -> List[Tuple[List[int], int]]:
+        """
+        Groups text positions into batches that respect the token and input-count limits.
+        Returns (positions, token_count) per batch.
+        """
+        batches: List[Tuple[List[int], int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for position, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= self.max_batch_inputs):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(position)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_started()
+        batches = self.pack(texts)
+        results = await asyncio.gather(*[
+            self._embed_batch([texts[position] for position in batch], tokens) for batch, tokens in batches
+        ])
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for (batch, _), batch_vectors in zip(batches, results):
+            for position, vector in zip(batch, batch_vectors):
+                vectors[position] = vector
+        return vectors
+
+    async def _embed_batch(self, batch: List[str], tokens: int) -> List[List[float]]:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._bucket.acquire(tokens)
+                started = time.perf_counter()
+                try:
+                    response = await self._client.embeddings.create(model=self.model, input=batch)
+                except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+                    # APITimeoutError is a subclass of APIConnectionError and carries no response.
+                    response = getattr(e, "response", None)
+                    if isinstance(e, RateLimitError):
+                        self.rate_limited += 1
+                        self._bucket.slow_down()
+                    else:
+                        self.transient_errors += 1
+                    if attempt == self.max_retries:
+                        raise
+                    retry_after = response.headers.get("retry-after") if response is not None else None
+                    try:
+                        delay = float(retry_after) if retry_after else min(60.0, 2 ** attempt)
+                    except ValueError:
+                        delay = min(60.0, 2 ** attempt)
+                    delay += random.uniform(0, delay / 4)
+                    logging.warning(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                latency = time.perf_counter() - started
+                self.batch_latencies.append(latency)
+                self.batches += 1
+                self.tokens += response.usage.total_tokens if response.usage else tokens
+                self._bucket.speed_up()
+                logging.debug(f"Embedded {len(batch)} texts ({tokens} tokens) in {latency * 1000:.0f} ms")
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def stats(self) -> Dict[str, float]:
+        latencies = np.array(self.batch_latencies) * 1000 if self.batch_latencies else None
+        return {
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "rate_limited": self.rate_limited,
+            "transient_errors": self.transient_errors,
+            "tokens_per_minute_budget": round(self._bucket.rate * 60) if self._bucket else self._tokens_per_minute,
+            "batch_latency_ms_p50": float(np.percentile(latencies, 50)) if latencies is not None else None,
+            "batch_latency_ms_p95": float(np.percentile(latencies, 95)) if latencies is not None else None,
+            "batch_latency_ms_last": float(latencies[-1]) if latencies is not None else None,
+        }
+
+
+class ExecutorEmbeddings(Embeddings):
+    """
+    LangChain embeddings whose async methods go through an EmbeddingExecutor. The sync methods fall
+    back to the wrapped LangChain model for callers that cannot await.
+    """
+
+    def __init__(self, executor: EmbeddingExecutor, sync_embeddings: Embeddings):
+        self.executor = executor
+        self.sync_embeddings = sync_embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.sync_embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.sync_embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.executor.embed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.executor.embed([text]))[0]
@@ -1,20 +1,120 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from chonkie import SemanticChunker
-from pinecone.grpc import PineconeGRPC as Pinecone
-from app.config import OPENAI_API_KEY, PINECONE_API_KEY
-
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-vector_store = Chroma(embedding_function=embeddings)
-chunker = SemanticChunker(
-    embedding_model="minishlab/potion-base-8M",
-    threshold=0.5,
-    chunk_size=512,
-    min_sentences=1
-)
-pc = Pinecone(
-    api_key=PINECONE_API_KEY,
-    pool_threads=30,
-    ssl_verify=False
+"""
+Embedding, chunking and vector store clients.
+
+Everything here is created on first use rather than at import time, so importing the app does not
+load models or open network connections. Each accessor is safe to call from several threads; the
+first caller builds the client and the rest wait for it.
+"""
+import threading
+
+from app.config import (
+    OPENAI_API_KEY, PINECONE_API_KEY, EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_BACKEND, LOCAL_EMBEDDING_MODEL, PINECONE_INDEX_NAME
 )
-index_name = 'document-rag'
+
+CHUNKER_MODEL = "minishlab/potion-base-8M"
+index_name = PINECONE_INDEX_NAME
+
+# Re-entrant because get_embeddings may load the chunker model while holding it.
+_init_lock = threading.RLock()
+_chunker_model = None
+_chunker = None
+_embeddings = None
+_embedding_cache = None
+_embedding_executor = None
+_pinecone = None
+_index = None
+
+
+def get_chunker_model():
+    global _chunker_model
+    if _chunker_model is None:
+        with _init_lock:
+            if _chunker_model is None:
+                from model2vec import StaticModel
+                _chunker_model = StaticModel.from_pretrained(CHUNKER_MODEL)
+    return _chunker_model
+
+
+def get_chunker():
+    global _chunker
+    if _chunker is None:
+        with _init_lock:
+            if _chunker is None:
+                from chonkie import SemanticChunker
+                from chonkie.embeddings import Model2VecEmbeddings
+                _chunker = SemanticChunker(
+                    embedding_model=Model2VecEmbeddings(get_chunker_model()),
+                    threshold=0.5,
+                    chunk_size=512,
+                    min_sentences=1
+                )
+    return _chunker
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _init_lock:
+            if _embeddings is None:
+                _embeddings = _create_embeddings()
+    return _embeddings
+
+
+def _create_embeddings():
+    global _embedding_cache, _embedding_executor
+    if EMBEDDING_BACKEND == "local":
+        from app.utils.local_embeddings import LocalEmbeddings
+        # Static-model vectors are cheaper to recompute than to look up, so they are not cached.
+        if LOCAL_EMBEDDING_MODEL == CHUNKER_MODEL:
+            local_model = get_chunker_model()
+        else:
+            from model2vec import StaticModel
+            local_model = StaticModel.from_pretrained(LOCAL_EMBEDDING_MODEL)
+        return LocalEmbeddings(local_model, model_name=LOCAL_EMBEDDING_MODEL)
+    if EMBEDDING_BACKEND == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        from app.utils.embedding_cache import EmbeddingCache, CachedEmbeddings
+        from app.utils.embedding_executor import EmbeddingExecutor, ExecutorEmbeddings
+        openai_embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+        _embedding_executor = EmbeddingExecutor(api_key=OPENAI_API_KEY, model=openai_embeddings.model)
+        executor_embeddings = ExecutorEmbeddings(_embedding_executor, sync_embeddings=openai_embeddings)
+        if EMBEDDING_CACHE_ENABLED:
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
+            return CachedEmbeddings(executor_embeddings, _embedding_cache, model=openai_embeddings.model)
+        return executor_embeddings
+    raise ValueError(f"Unsupported embedding backend: {EMBEDDING_BACKEND}")
+
+
+def get_embedding_cache():
+    """The disk embedding cache, or None if disabled or embeddings have not been used yet."""
+    return _embedding_cache
+
+
+def get_embedding_executor():
+    """The OpenAI embedding executor, or None for the local backend or before first use."""
+    return _embedding_executor
+
+
+def get_pinecone():
+    global _pinecone
+    if _pinecone is None:
+        with _init_lock:
+            if _pinecone is None:
+                from pinecone.grpc import PineconeGRPC as Pinecone
+                _pinecone = Pinecone(
+                    api_key=PINECONE_API_KEY,
+                    pool_threads=30,
+                    ssl_verify=False
+                )
+    return _pinecone
+
+
+def get_index():
+    """The process-wide handle to the Pinecone index; its gRPC channel is shared by all requests."""
+    global _index
+    if _index is None:
+        with _init_lock:
+            if _index is None:
+                _index = get_pinecone().Index(index_name)
+    return _index
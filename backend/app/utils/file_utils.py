@@ -0,0 +1,31 @@
+import os
+import hashlib
+import tempfile
+import logging
+from fastapi import UploadFile
+from typing import Tuple
+from app.config import UPLOAD_SPOOL_CHUNK_SIZE
+
+
+async def spool_upload(file: UploadFile) -> Tuple[str, str]:
+    """
+    Copies an uploaded file to a local temporary file in fixed-size chunks, so memory use
+    stays bounded whatever the upload size, and fingerprints it with SHA-256 on the way.
+    Returns the path and the hex digest; the caller owns the file.
+    """
+    digest = hashlib.sha256()
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        try:
+            while True:
+                data = await file.read(UPLOAD_SPOOL_CHUNK_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+                temp_file.write(data)
+        except Exception:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+    logging.info(f"Spooled upload '{file.filename}' to {temp_file.name}")
+    return temp_file.name, digest.hexdigest()
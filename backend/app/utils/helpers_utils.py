@@ -4,12 +4,12 @@ import aiohttp
 from fastapi.exceptions import HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
-from langchain import hub
 from app.config import JINA_API_KEY
+from app.utils.prompt_utils import get_prompt
 
 
 
-prompt = hub.pull("rlm/rag-prompt")
+prompt = get_prompt("rag_prompt")
 
 # Utility functions
 def batch_iterable(iterable, batch_size=200):
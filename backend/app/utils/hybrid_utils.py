@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.config import RRF_K, BM25_INDEX_CACHE_SIZE
+from app.utils.bm25 import BM25Index
+from app.utils.s3_utils import get_s3_key, s3_client
+
+
+def get_bm25_key(document_key: str) -> str:
+    """S3 key of the BM25 index stored next to a document (PDF S3 key)."""
+    return f"{document_key}.bm25.json.gz"
+
+
+def get_youtube_bm25_key(username: str, video_id: str) -> str:
+    return get_s3_key(username, f"youtube/{video_id}.bm25.json.gz")
+
+
+def save_bm25_index(bm25_index: BM25Index, key: str):
+    """Blocking upload of a BM25 index to S3; run it in a thread from async code."""
+    s3_client.put_object(
+        Bucket=os.getenv("S3_BUCKET_NAME"),
+        Key=key,
+        Body=bm25_index.to_bytes(),
+        ContentType="application/json",
+        ContentEncoding="gzip"
+    )
+
+
+def load_bm25_index(key: str) -> Optional[BM25Index]:
+    """Blocking download of a BM25 index from S3; None when the document has none."""
+    try:
+        response = s3_client.get_object(Bucket=os.getenv("S3_BUCKET_NAME"), Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return BM25Index.from_bytes(response["Body"].read())
+
+
+class BM25IndexCache:
+    """
+    LRU of BM25 indexes loaded from S3, keyed by S3 key. A lookup names the document version it
+    expects; an index built from another version is not used. Missing indexes (documents ingested
+    before hybrid retrieval) are remembered too, so they are not looked up on every query.
+    """
+
+    def __init__(self, max_entries: int = BM25_INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, Optional[BM25Index]]]" = OrderedDict()
+
+    async def get(self, key: str, version: str = "") -> Optional[BM25Index]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        try:
+            bm25_index = await asyncio.to_thread(load_bm25_index, key)
+        except Exception as e:
+            logging.error(f"Loading BM25 index {key} failed: {str(e)}")
+            return None
+        if bm25_index is not None and bm25_index.version != version:
+            bm25_index = None
+        self._entries[key] = (version, bm25_index)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return bm25_index
+
+    def invalidate(self, prefix: str):
+        """Drops every index whose S3 key starts with prefix."""
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, float]:
+        return {"indexes": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+bm25_indexes = BM25IndexCache()
+
+
+def reciprocal_rank_fusion(*rankings: List[str], k: int = RRF_K) -> List[str]:
+    """Fuses ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+async def fetch_texts(index, namespace: str, vector_ids: List[str]) -> Dict[str, str]:
+    """Chunk texts of the given vectors, read from their Pinecone metadata."""
+    if not vector_ids:
+        return {}
+    response = await asyncio.to_thread(index.fetch, ids=vector_ids, namespace=namespace)
+    return {vector_id: vector.metadata["text"] for vector_id, vector in response.vectors.items()}
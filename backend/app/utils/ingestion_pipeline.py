@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from app.config import EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, INGESTION_PIPELINE_QUEUE_SIZE
+from app.utils.embedding_utils import get_embeddings, get_chunker
+from app.utils.embedding_cache import hash_text
+from app.utils.job_queue import IngestionJob
+from app.utils.upsert_utils import PineconeUpserter
+from app.utils.metrics import observe_stage, stage_timer
+
+# (chunk_index, chunk_text, vector) -> Pinecone vector dict
+VectorBuilder = Callable[[int, str, List[float]], Dict[str, Any]]
+# (chunk_index, chunk_hash) -> id of an already indexed vector to keep, or None to embed the chunk
+ReuseLookup = Callable[[int, str], Optional[str]]
+# (chunk_index, chunk_text), called for every chunk in order
+ChunkObserver = Callable[[int, str], None]
+
+_END = object()
+
+
+async def iter_texts(*texts: str) -> AsyncIterator[str]:
+    """Adapts already materialized text (e.g. a transcript) to the pipeline's async input."""
+    for text in texts:
+        yield text
+
+
+async def run_ingestion_pipeline(
+    texts: AsyncIterator[str],
+    build_vector: VectorBuilder,
+    upserter: PineconeUpserter,
+    job: Optional[IngestionJob] = None,
+    reuse_vector: Optional[ReuseLookup] = None,
+    on_chunk: Optional[ChunkObserver] = None,
+    embed_batch_size: int = EMBEDDING_BATCH_SIZE,
+    embed_concurrency: int = EMBEDDING_CONCURRENCY,
+    queue_size: int = INGESTION_PIPELINE_QUEUE_SIZE,
+    embeddings: Optional[Embeddings] = None
+) -> List[Tuple[str, str]]:
+    """
+    Streams text through chunk -> embed -> upsert without materializing the whole document.
+
+    A producer task chunks each incoming text segment and feeds a bounded queue; the consumer
+    embeds chunks in batches of `embed_batch_size`, with up to `embed_concurrency` batches in
+    flight, and hands the vectors straight to the upserter. The queue bound, the in-flight batch
+    limit and the upserter's in-flight limit give backpressure between the stages, so peak memory
+    depends on the batch sizes rather than on the document size.
+
+    When reuse_vector is given, every chunk's (index, content hash) is offered to it first; chunks
+    it returns a vector id for are already indexed and skip embedding and upsert.
+    on_chunk sees every chunk's index and text, reused or not (e.g. to build a lexical index).
+    Returns the document's chunk manifest: (chunk_hash, vector_id) for every chunk, in order.
+    """
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    embeddings = embeddings or get_embeddings()
+
+    def start(stage: str):
+        if job is not None:
+            job.start_stage(stage)
+
+    def finish(stage: str):
+        if job is not None:
+            job.finish_stage(stage)
+
+    async def produce():
+        try:
+            start("parsing")
+            waited = time.perf_counter()
+            async for text in texts:
+                # Time spent waiting on the text source is parse (or transcript fetch) time.
+                observe_stage("parse", time.perf_counter() - waited)
+                start("chunking")
+                with stage_timer("chunk"):
+                    chunks = await asyncio.to_thread(get_chunker().chunk, text)
+                for chunk in chunks:
+                    await chunk_queue.put(chunk.text)
+                    if job is not None:
+                        job.chunks_total += 1
+                waited = time.perf_counter()
+            finish("parsing")
+            finish("chunking")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Wake the consumer so it stops and the error surfaces when the producer is awaited.
+            await chunk_queue.put(_END)
+            raise
+        await chunk_queue.put(_END)
+
+    manifest: List[Tuple[str, Optional[str]]] = []
+
+    async def embed_and_upsert(batch: List[Tuple[int, str]]):
+        start("embedding")
+        with stage_timer("embed"):
+            vectors = await embeddings.aembed_documents([text for _, text in batch])
+        if job is not None:
+            job.chunks_embedded += len(vectors)
+        start("upserting")
+        built = []
+        for (idx, text), vector in zip(batch, vectors):
+            built.append(build_vector(idx, text, vector))
+            manifest[idx] = (manifest[idx][0], built[-1]["id"])
+        with stage_timer("upsert"):
+            await upserter.add(built)
+
+    in_flight: Set[asyncio.Task] = set()
+
+    async def wait_in_flight(limit: int):
+        # Re-raises the first failed batch, so an embedding error stops the pipeline early.
+        while len(in_flight) > limit:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.difference_update(done)
+            # Collect every finished batch's error, not just the first, so none goes unretrieved.
+            errors = [task.exception() for task in done if not task.cancelled() and task.exception() is not None]
+            if errors:
+                raise errors[0]
+
+    async def submit(batch: List[Tuple[int, str]]):
+        await wait_in_flight(max(1, embed_concurrency) - 1)
+        in_flight.add(asyncio.create_task(embed_and_upsert(batch)))
+
+    producer = asyncio.create_task(produce())
+    try:
+        batch: List[Tuple[int, str]] = []
+        while True:
+            item = await chunk_queue.get()
+            if item is _END:
+                break
+            idx = len(manifest)
+            if on_chunk is not None:
+                on_chunk(idx, item)
+            chunk_hash = hash_text(item)
+            vector_id = reuse_vector(idx, chunk_hash) if reuse_vector is not None else None
+            manifest.append((chunk_hash, vector_id))
+            if vector_id is not None:
+                if job is not None:
+                    job.chunks_reused += 1
+                continue
+            batch.append((idx, item))
+            if len(batch) >= embed_batch_size:
+                await submit(batch)
+                batch = []
+        if batch:
+            await submit(batch)
+        await wait_in_flight(0)
+        finish("embedding")
+        # Surface producer failures (parse/chunk errors) before committing the upserts.
+        await producer
+        with stage_timer("upsert"):
+            await upserter.flush()
+        finish("upserting")
+    except BaseException:
+        producer.cancel()
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(producer, *in_flight, return_exceptions=True)
+        raise
+
+    logging.info(f"Ingestion pipeline processed {len(manifest)} chunks")
+    return manifest
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config import (
+    INGESTION_QUEUE_BACKEND,
+    INGESTION_QUEUE_MAXSIZE,
+    INGESTION_WORKERS,
+    INGESTION_JOB_RETENTION,
+    INGESTION_JOB_SYNC_SECONDS,
+    INGESTION_JOB_STALE_SECONDS,
+)
+from app.dependencies.job_dependencies import save_jobs, fail_orphaned_jobs
+
+JOB_STAGES = ("queued", "parsing", "chunking", "embedding", "upserting", "completed", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the ingestion queue is at capacity."""
+
+
+class IngestionJob:
+    """Tracks the progress of a single document ingestion."""
+
+    def __init__(self, username: str, kind: str, source: str):
+        self.job_id = str(uuid.uuid4())
+        self.username = username
+        self.kind = kind
+        self.source = source
+        self.stage = "queued"
+        self.stages: Dict[str, Dict[str, Optional[str]]] = {}
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.chunks_upserted = 0
+        self.chunks_reused = 0
+        self.error: Optional[str] = None
+        self.result: Dict[str, Any] = {}
+        self.created_at = datetime.utcnow()
+        self.updated_at = self.created_at
+        self._open_stage("queued")
+
+    def _open_stage(self, stage: str):
+        self.stages[stage] = {"started_at": datetime.utcnow().isoformat(), "finished_at": None}
+
+    def set_stage(self, stage: str):
+        if stage not in JOB_STAGES:
+            raise ValueError(f"Unknown ingestion stage: {stage}")
+        now = datetime.utcnow()
+        if self.stage in self.stages and self.stages[self.stage]["finished_at"] is None:
+            self.stages[self.stage]["finished_at"] = now.isoformat()
+        self.stage = stage
+        self._open_stage(stage)
+        self.updated_at = now
+
+    def start_stage(self, stage: str):
+        """Marks a stage as running without closing the others, for pipelines whose stages overlap."""
+        if stage not in JOB_STAGES:
+            raise ValueError(f"Unknown ingestion stage: {stage}")
+        if stage in self.stages:
+            return
+        if self.stage == "queued":
+            self.stages["queued"]["finished_at"] = datetime.utcnow().isoformat()
+        self.stage = stage
+        self._open_stage(stage)
+        self.updated_at = datetime.utcnow()
+
+    def finish_stage(self, stage: str):
+        if stage in self.stages and self.stages[stage]["finished_at"] is None:
+            self.stages[stage]["finished_at"] = datetime.utcnow().isoformat()
+            self.updated_at = datetime.utcnow()
+
+    def fail(self, error: str):
+        self.error = error
+        self.set_stage("failed")
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "source": self.source,
+            "stage": self.stage,
+            "stages": {stage: dict(times) for stage, times in self.stages.items()},
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_upserted": self.chunks_upserted,
+            "chunks_reused": self.chunks_reused,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+JobHandler = Callable[..., Awaitable[None]]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LocalJobQueue:
+    """
+    In-process ingestion queue backed by an asyncio.Queue and a fixed pool of worker tasks.
+    Handlers run on the event loop, so they must push blocking work to threads or processes.
+
+    Job status is mirrored to the database (on submit, on completion and every sync_seconds while
+    running, which doubles as a heartbeat), so /upload-status answers from any web worker and
+    survives restarts. Unfinished jobs whose heartbeat is older than stale_seconds, and on startup
+    those left behind by a dead process on this host, are marked failed with their documents.
+    """
+
+    def __init__(self, maxsize: int = INGESTION_QUEUE_MAXSIZE, workers: int = INGESTION_WORKERS,
+                 retention: int = INGESTION_JOB_RETENTION, sync_seconds: float = INGESTION_JOB_SYNC_SECONDS,
+                 stale_seconds: float = INGESTION_JOB_STALE_SECONDS):
+        self.maxsize = maxsize
+        self.workers = workers
+        self.retention = retention
+        self.sync_seconds = sync_seconds
+        self.stale_seconds = stale_seconds
+        self.owner: Optional[str] = None
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._sync_task: Optional[asyncio.Task] = None
+        # Finished jobs whose final state has not reached the database yet.
+        self._unsynced: Set[str] = set()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._worker_tasks)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self.started:
+            return
+        # Set here rather than at import, so each forked web worker gets its own.
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(n), name=f"ingestion-worker-{n}")
+            for n in range(self.workers)
+        ]
+        await self._fail_orphans(startup=True)
+        self._sync_task = asyncio.create_task(self._sync_loop(), name="ingestion-job-sync")
+        logging.info(f"Started {self.workers} ingestion workers (queue maxsize={self.maxsize})")
+
+    async def stop(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+        # Jobs still waiting in the queue are lost with it; record them, and the interrupted ones, as failed.
+        for job in self.jobs.values():
+            if not job.done:
+                job.fail("Ingestion worker was shut down")
+                self._unsynced.add(job.job_id)
+        await self._sync()
+        logging.info("Stopped ingestion workers")
+
+    async def join(self):
+        """Wait until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def submit(self, job: IngestionJob, handler: JobHandler, *args) -> IngestionJob:
+        if not self.started:
+            await self.start()
+        try:
+            self._queue.put_nowait((job, handler, args))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Ingestion queue is full ({self.maxsize} jobs pending)")
+        self._remember(job)
+        await self._persist([job])
+        return job
+
+    async def record(self, job: IngestionJob) -> IngestionJob:
+        """Registers a job that finished without going through the queue (e.g. a deduplicated upload)."""
+        self._remember(job)
+        await self._persist([job])
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """A job known to this worker; see get_job in app.dependencies.job_dependencies for the others."""
+        return self.jobs.get(job_id)
+
+    def _remember(self, job: IngestionJob):
+        self.jobs[job.job_id] = job
+        # Drop the oldest finished jobs once we are past the retention limit.
+        while len(self.jobs) > self.retention:
+            oldest_id = next((job_id for job_id, old in self.jobs.items() if old.done), None)
+            if oldest_id is None:
+                break
+            del self.jobs[oldest_id]
+
+    async def _persist(self, jobs: List[IngestionJob]) -> bool:
+        # Snapshot on the event loop; the handlers keep mutating the jobs while the thread writes.
+        states = [(job.username, job.to_dict()) for job in jobs]
+        try:
+            await asyncio.to_thread(save_jobs, states, self.owner)
+            return True
+        except Exception as e:
+            logging.error(f"Saving ingestion job status failed: {str(e)}")
+            return False
+
+    async def _sync(self):
+        jobs = [job for job in self.jobs.values() if not job.done or job.job_id in self._unsynced]
+        if jobs and await self._persist(jobs):
+            self._unsynced.difference_update(job.job_id for job in jobs)
+
+    async def _fail_orphans(self, startup: bool = False):
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        host = socket.gethostname()
+
+        def is_orphaned(row) -> bool:
+            if row.owner == self.owner:
+                # Ours only if this process lost track of it (a restart that reused the pid).
+                return row.job_id not in self.jobs
+            if row.heartbeat_at is None or row.heartbeat_at < stale_before:
+                return True
+            owner_host, _, owner_pid = (row.owner or "").rpartition(":")
+            return startup and owner_host == host and owner_pid.isdigit() and not _pid_alive(int(owner_pid))
+
+        try:
+            failed_jobs, failed_documents = await asyncio.to_thread(
+                fail_orphaned_jobs, is_orphaned, "Ingestion worker stopped before the job finished"
+            )
+        except Exception as e:
+            logging.error(f"Checking for orphaned ingestion jobs failed: {str(e)}")
+            return
+        if failed_jobs or failed_documents:
+            logging.warning(f"Marked {failed_jobs} orphaned ingestion jobs and {failed_documents} documents as failed")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            await self._sync()
+            await self._fail_orphans()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job, handler, args = await self._queue.get()
+            try:
+                logging.info(f"Worker {worker_id} picked up ingestion job {job.job_id}")
+                await handler(job, *args)
+                if not job.done:
+                    job.set_stage("completed")
+                logging.info(f"Ingestion job {job.job_id} completed")
+            except asyncio.CancelledError:
+                job.fail("Ingestion worker was shut down")
+                raise
+            except Exception as e:
+                logging.error(f"Ingestion job {job.job_id} failed: {str(e)}")
+                job.fail(str(e))
+            finally:
+                self._unsynced.add(job.job_id)
+                self._queue.task_done()
+            if await self._persist([job]):
+                self._unsynced.discard(job.job_id)
+
+
+def create_job_queue(backend: str = INGESTION_QUEUE_BACKEND) -> LocalJobQueue:
+    if backend == "local":
+        return LocalJobQueue()
+    raise ValueError(f"Unsupported ingestion queue backend: {backend}")
+
+
+job_queue = create_job_queue()
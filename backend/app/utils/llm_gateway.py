@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    GROQ_API_KEY,
+    OPENAI_API_KEY,
+    LLM_BACKEND,
+    GROQ_CONCURRENCY,
+    OPENAI_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS,
+    LLM_MAX_RETRIES,
+)
+from app.utils.metrics import observe_stage
+
+# (prompt_tokens, completion_tokens) as reported by the provider; None when it reports nothing.
+Usage = Optional[Tuple[int, int]]
+
+
+def _usage(usage) -> Usage:
+    if usage is None:
+        return None
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+class ProviderBackend:
+    """
+    Raw calls to Groq and OpenAI through their async SDKs. One client per provider is created on
+    first use (so its connection pool binds to the running event loop) and reused for every call.
+    """
+
+    def __init__(self, timeout: float = LLM_TIMEOUT_SECONDS, max_retries: int = LLM_MAX_RETRIES,
+                 pool_sizes: Optional[Dict[str, int]] = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_sizes = pool_sizes or {}
+        self._clients = {}
+
+    def _client(self, provider: str):
+        client = self._clients.get(provider)
+        if client is None:
+            import httpx
+            size = self.pool_sizes.get(provider, 16)
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=60),
+                timeout=self.timeout
+            )
+            if provider == "groq":
+                from groq import AsyncGroq
+                client = AsyncGroq(api_key=GROQ_API_KEY, timeout=self.timeout, max_retries=self.max_retries, http_client=http_client)
+            elif provider == "openai":
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=self.timeout, max_retries=self.max_retries, http_client=http_client)
+            else:
+                raise ValueError(f"Unsupported LLM provider: {provider}")
+            self._clients[provider] = client
+        return client
+
+    async def chat(self, provider: str, **kwargs) -> Tuple[str, Usage]:
+        completion = await self._client(provider).chat.completions.create(stream=False, **kwargs)
+        return completion.choices[0].message.content, _usage(completion.usage)
+
+    async def stream(self, provider: str, **kwargs) -> AsyncIterator[Tuple[str, Usage]]:
+        stream = await self._client(provider).chat.completions.create(stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                # Groq reports usage on the final chunk under x_groq.
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if delta or usage is not None:
+                    yield delta or "", _usage(usage)
+        finally:
+            await stream.close()
+
+    async def transcribe(self, provider: str, **kwargs) -> str:
+        transcription = await self._client(provider).audio.transcriptions.create(**kwargs)
+        return transcription.text
+
+    async def list_models(self, provider: str):
+        return await self._client(provider).models.list()
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients = {}
+
+
+class FakeBackend:
+    """
+    Offline stand-in for the providers (LLM_BACKEND=fake): deterministic answers built from the
+    last user message, word-by-word streaming and a fixed transcription, with optional latency.
+    """
+
+    def __init__(self, latency: float = 0.0, transcription: str = "What is this document about?"):
+        self.latency = latency
+        self.transcription = transcription
+
+    @staticmethod
+    def _answer(messages: List[Dict[str, str]]) -> str:
+        question = next((message["content"] for message in reversed(messages) if message["role"] == "user"), "")
+        return f"Fake answer to: {' '.join(question.split()[:32])}"
+
+    @staticmethod
+    def _usage(messages: List[Dict[str, str]], answer: str) -> Usage:
+        return sum(len(message["content"].split()) for message in messages), len(answer.split())
+
+    async def chat(self, provider: str, messages: List[Dict[str, str]], **kwargs) -> Tuple[str, Usage]:
+        await asyncio.sleep(self.latency)
+        answer = self._answer(messages)
+        return answer, self._usage(messages, answer)
+
+    async def stream(self, provider: str, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[Tuple[str, Usage]]:
+        answer = self._answer(messages)
+        words = answer.split(" ")
+        for position, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield (word if position == 0 else f" {word}"), None
+        yield "", self._usage(messages, answer)
+
+    async def transcribe(self, provider: str, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        return self.transcription
+
+    async def list_models(self, provider: str):
+        return []
+
+    async def close(self):
+        pass
+
+
+class ProviderStats:
+    """Call counts, token totals and latency percentiles for one provider."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.first_token_latencies: Deque[float] = deque(maxlen=1000)
+
+    def record(self, latency: float, usage: Usage):
+        self.calls += 1
+        self.latencies.append(latency)
+        if usage is not None:
+            self.prompt_tokens += usage[0]
+            self.completion_tokens += usage[1]
+
+    def to_dict(self) -> Dict[str, float]:
+        latencies = np.array(self.latencies) * 1000 if self.latencies else None
+        first_token = np.array(self.first_token_latencies) * 1000 if self.first_token_latencies else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies is not None else None,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies is not None else None,
+            "first_token_ms_p50": float(np.percentile(first_token, 50)) if first_token is not None else None,
+        }
+
+
+class LLMGateway:
+    """
+    Single async entry point for chat completions and transcriptions. Every call goes through a
+    per-provider semaphore, so a burst of requests queues here instead of opening unbounded
+    connections, and is timed and counted per provider. Nothing blocks the event loop.
+    """
+
+    def __init__(self, backend, concurrency: Optional[Dict[str, int]] = None):
+        self.backend = backend
+        self.concurrency = concurrency or {"groq": GROQ_CONCURRENCY, "openai": OPENAI_CONCURRENCY}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self._semaphores:
+            self._semaphores[provider] = asyncio.Semaphore(self.concurrency.get(provider, 8))
+        return self._semaphores[provider]
+
+    def _provider_stats(self, provider: str) -> ProviderStats:
+        return self._stats.setdefault(provider, ProviderStats())
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, provider: str = "groq", **kwargs) -> str:
+        """Returns the full completion text."""
+        stats = self._provider_stats(provider)
+        async with self._semaphore(provider):
+            stats.in_flight += 1
+            started = time.perf_counter()
+            try:
+                answer, usage = await self.backend.chat(provider, messages=messages, model=model, **kwargs)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+        stats.record(time.perf_counter() - started, usage)
+        observe_stage("llm", time.perf_counter() - started)
+        return answer
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: str, provider: str = "groq", **kwargs) -> AsyncIterator[str]:
+        """
+        Yields the completion text as it is generated. The provider slot is held until the stream
+        ends; closing the iterator early (client disconnect) closes the upstream response.
+        """
+        stats = self._provider_stats(provider)
+        async with self._semaphore(provider):
+            stats.in_flight += 1
+            started = time.perf_counter()
+            usage = None
+            first_token = True
+            try:
+                async for delta, chunk_usage in self.backend.stream(provider, messages=messages, model=model, **kwargs):
+                    if chunk_usage is not None:
+                        usage = chunk_usage
+                    if delta:
+                        if first_token:
+                            stats.first_token_latencies.append(time.perf_counter() - started)
+                            first_token = False
+                        yield delta
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+            stats.record(time.perf_counter() - started, usage)
+            observe_stage("llm", time.perf_counter() - started)
+
+    async def transcribe(self, file, model: str = "whisper-1", provider: str = "openai") -> str:
+        """Transcribes an audio file (a file object or a (filename, bytes) tuple)."""
+        stats = self._provider_stats(provider)
+        async with self._semaphore(provider):
+            stats.in_flight += 1
+            started = time.perf_counter()
+            try:
+                text = await self.backend.transcribe(provider, file=file, model=model)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.in_flight -= 1
+        stats.record(time.perf_counter() - started, None)
+        observe_stage("transcribe", time.perf_counter() - started)
+        return text
+
+    async def warm_up(self, provider: str):
+        """Opens a pooled TLS connection to the provider."""
+        await self.backend.list_models(provider)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {provider: stats.to_dict() for provider, stats in self._stats.items()}
+
+
+def create_llm_gateway(backend: str = LLM_BACKEND) -> LLMGateway:
+    if backend == "providers":
+        return LLMGateway(ProviderBackend(pool_sizes={"groq": GROQ_CONCURRENCY, "openai": OPENAI_CONCURRENCY}))
+    if backend == "fake":
+        logging.info("Using the fake LLM backend")
+        return LLMGateway(FakeBackend())
+    raise ValueError(f"Unsupported LLM backend: {backend}")
+
+
+llm_gateway = create_llm_gateway()
@@ -0,0 +1,44 @@
+import asyncio
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    In-process CPU embeddings from a model2vec static model. Texts are encoded in batches and
+    L2-normalized with NumPy, so dot products equal cosine similarity like OpenAI vectors.
+    """
+
+    def __init__(self, model, model_name: str, batch_size: int = 1024):
+        # `model` is a model2vec StaticModel, shared with the semantic chunker.
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    @property
+    def dimension(self) -> int:
+        return self.model.dim
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(
+            self.model.encode(texts, batch_size=self.batch_size, use_multiprocessing=False),
+            dtype=np.float32
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+import pymupdf
+import pymupdf4llm
+
+from app.config import PDF_PARSE_WORKERS, PDF_PAGE_BATCH_SIZE, PDF_PARSE_PREFETCH
+
+# Worker processes are spawned and re-import this module (and so load pymupdf4llm), so it must
+# not import the API's clients or services.
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def create_parse_executor(workers: int = PDF_PARSE_WORKERS) -> ProcessPoolExecutor:
+    # "spawn" keeps the workers clear of the gRPC/HTTP client threads living in the API process.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_parse_executor()
+                logging.info(f"Started PDF parse pool with {PDF_PARSE_WORKERS} processes")
+    return _executor
+
+
+def shutdown_parse_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+async def warm_parse_executor(workers: int = PDF_PARSE_WORKERS):
+    """
+    Spawns the parse worker processes ahead of the first upload; each one imports this module
+    (and pymupdf4llm) while starting. The pool spawns a process per submitted task while none
+    is idle, so one trivial task per worker is enough.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_parse_executor()
+    await asyncio.gather(*[loop.run_in_executor(executor, _worker_pid) for _ in range(workers)])
+
+
+def get_page_count(file_path: str) -> int:
+    with pymupdf.open(file_path) as doc:
+        return doc.page_count
+
+
+def page_batches(page_count: int, batch_size: int = PDF_PAGE_BATCH_SIZE) -> List[List[int]]:
+    """Split the page numbers of a document into consecutive batches."""
+    batch_size = max(1, batch_size)
+    return [list(range(start, min(start + batch_size, page_count))) for start in range(0, page_count, batch_size)]
+
+
+def _identify_headers(file_path: str) -> pymupdf4llm.IdentifyHeaders:
+    return pymupdf4llm.IdentifyHeaders(file_path)
+
+
+def _pages_to_markdown(file_path: str, pages: List[int], hdr_info: pymupdf4llm.IdentifyHeaders) -> str:
+    return pymupdf4llm.to_markdown(file_path, pages=pages, hdr_info=hdr_info, show_progress=False)
+
+
+async def iter_markdown_batches(
+    file_path: str,
+    executor: Optional[Executor] = None,
+    batch_size: int = PDF_PAGE_BATCH_SIZE,
+    prefetch: int = PDF_PARSE_PREFETCH
+) -> AsyncIterator[str]:
+    """
+    Converts a PDF to markdown in page batches on a process pool.
+    Batches are yielded in page order as soon as each one (and every batch before it) is ready,
+    so downstream stages can start before the whole document is parsed. At most `prefetch`
+    batches are parsed ahead of the consumer, which keeps memory flat for long documents.
+    """
+    executor = executor or get_parse_executor()
+    loop = asyncio.get_running_loop()
+
+    page_count = await loop.run_in_executor(executor, get_page_count, file_path)
+    # Header levels are derived from font sizes over the whole document, so every batch agrees on them.
+    hdr_info = await loop.run_in_executor(executor, _identify_headers, file_path)
+
+    batches = deque(page_batches(page_count, batch_size))
+    logging.info(f"Parsing {page_count} pages of {file_path} in {len(batches)} batches")
+    in_flight = deque()
+    try:
+        while batches or in_flight:
+            while batches and len(in_flight) < max(1, prefetch):
+                in_flight.append(loop.run_in_executor(executor, _pages_to_markdown, file_path, batches.popleft(), hdr_info))
+            yield await in_flight.popleft()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+async def parse_pdf(file_path: str, executor: Optional[Executor] = None, batch_size: int = PDF_PAGE_BATCH_SIZE,
+                    prefetch: int = PDF_PARSE_PREFETCH) -> str:
+    """Converts a whole PDF to markdown using the page-parallel parser."""
+    return "".join([batch async for batch in iter_markdown_batches(file_path, executor, batch_size, prefetch)])
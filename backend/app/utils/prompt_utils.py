@@ -0,0 +1,17 @@
+import os
+from functools import lru_cache
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+
+@lru_cache(maxsize=None)
+def get_prompt(name: str) -> str:
+    """
+    Loads a vendored prompt template from app/prompts/<name>.txt. Templates use str.format
+    placeholders, e.g. get_prompt("rag_prompt").format(context=..., question=...).
+    """
+    path = os.path.join(PROMPTS_DIR, f"{name}.txt")
+    if not os.path.isfile(path):
+        raise KeyError(f"Unknown prompt: {name}")
+    with open(path, encoding="utf-8") as prompt_file:
+        return prompt_file.read().rstrip("\n")
@@ -1,23 +1,264 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
 import aiohttp
-from fastapi import HTTPException
-from app.config import JINA_API_KEY
-
-async def rerank_documents(query: str, documents: list):
-    url = 'https://api.jina.ai/v1/rerank'
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f"Bearer {JINA_API_KEY}",
-        'User-Agent': 'RAGSystem/1.0'
-    }
-    data = {
-        "model": "jina-reranker-v2-base-multilingual",
-        "query": query,
-        "top_n": 3,
-        "documents": documents
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=data, ssl=False) as response:
-            if response.status != 200:
-                raise HTTPException(status_code=response.status, detail="Reranking failed")
-            return (await response.json())['results']
+import numpy as np
+
+from app.utils.bm25 import bm25_scores
+from app.config import (
+    JINA_API_KEY,
+    RERANKER_BACKEND,
+    LOCAL_EMBEDDING_MODEL,
+    RERANK_CONCURRENCY,
+    RERANK_TIMEOUT_SECONDS,
+    RERANK_DEADLINE_SECONDS,
+    RERANK_MAX_RETRIES,
+)
+
+JINA_RERANK_URL = 'https://api.jina.ai/v1/rerank'
+JINA_RERANK_MODEL = "jina-reranker-v2-base-multilingual"
+
+
+class RerankError(Exception):
+    """A rerank request failed in a way worth retrying (timeout, connection error, 429 or 5xx)."""
+
+
+def vector_order_results(documents: list, top_n: int) -> List[Dict]:
+    """The candidates in retrieval order, shaped like Jina rerank results."""
+    return [
+        {"index": idx, "document": {"text": text}, "relevance_score": None}
+        for idx, text in enumerate(documents[:top_n])
+    ]
+
+
+def ranked_results(documents: list, scores, top_n: int) -> List[Dict]:
+    """Orders candidates by score, shaped like Jina rerank results."""
+    order = np.argsort(-np.asarray(scores), kind="stable")[:top_n]
+    return [
+        {"index": int(idx), "document": {"text": documents[idx]}, "relevance_score": float(scores[idx])}
+        for idx in order
+    ]
+
+
+class Reranker:
+    """
+    Reorders retrieved passages for a query. rerank() returns the top_n candidates as
+    {"index", "document": {"text"}, "relevance_score"} dicts, best first.
+    """
+
+    async def rerank(self, query: str, documents: list, top_n: int = 3) -> List[Dict]:
+        raise NotImplementedError
+
+    async def warm_up(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class LocalReranker(Reranker):
+    """Base for in-process rerankers: scores the candidates synchronously and records latency."""
+
+    name = "local"
+    # Scorers that run a model set this so score() goes to a worker thread instead of the loop.
+    offload = False
+
+    def __init__(self):
+        self.calls = 0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+    def score(self, query: str, documents: list) -> np.ndarray:
+        raise NotImplementedError
+
+    async def rerank(self, query: str, documents: list, top_n: int = 3) -> List[Dict]:
+        if not documents:
+            return []
+        started = time.perf_counter()
+        if self.offload:
+            scores = await asyncio.to_thread(self.score, query, documents)
+        else:
+            # A handful of short passages scores in well under a millisecond, so this stays on the loop.
+            scores = self.score(query, documents)
+        results = ranked_results(documents, scores, top_n)
+        self.calls += 1
+        self.latencies.append(time.perf_counter() - started)
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        latencies = np.array(self.latencies) * 1000 if self.latencies else None
+        return {
+            "backend": self.name,
+            "calls": self.calls,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies is not None else None,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies is not None else None,
+        }
+
+
+class BM25Reranker(LocalReranker):
+    """Lexical reranking: BM25 over the candidate set."""
+
+    name = "bm25"
+
+    def score(self, query: str, documents: list) -> np.ndarray:
+        return bm25_scores(query, documents)
+
+
+class StaticEmbeddingReranker(LocalReranker):
+    """
+    Cosine similarity between query and passages under a model2vec static model; with the default
+    model this is the instance already loaded for chunking.
+    """
+
+    name = "static"
+    offload = True
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL):
+        super().__init__()
+        self.model_name = model_name
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            from app.utils.embedding_utils import CHUNKER_MODEL, get_chunker_model
+            if self.model_name == CHUNKER_MODEL:
+                self._model = get_chunker_model()
+            else:
+                from model2vec import StaticModel
+                self._model = StaticModel.from_pretrained(self.model_name)
+        return self._model
+
+    def score(self, query: str, documents: list) -> np.ndarray:
+        vectors = np.asarray(self._get_model().encode([query] + list(documents), use_multiprocessing=False), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[1:] @ vectors[0]
+
+    async def warm_up(self):
+        await asyncio.to_thread(self._get_model)
+
+
+class RerankerClient(Reranker):
+    """
+    Process-wide Jina reranker client. One aiohttp session keeps connections to api.jina.ai alive
+    across requests; a semaphore bounds concurrent calls; failed attempts are retried with jittered
+    backoff. The whole call runs under a deadline: if the reranker is slow or down, the candidates
+    are returned in vector order instead, so rerank latency cannot dominate answer latency.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = JINA_API_KEY,
+        concurrency: int = RERANK_CONCURRENCY,
+        timeout: float = RERANK_TIMEOUT_SECONDS,
+        deadline: float = RERANK_DEADLINE_SECONDS,
+        max_retries: int = RERANK_MAX_RETRIES
+    ):
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.calls = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created on first use so the session binds to the running event loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ssl=False)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': f"Bearer {self.api_key}",
+                    'User-Agent': 'RAGSystem/1.0'
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def rerank(self, query: str, documents: list, top_n: int = 3) -> List[Dict]:
+        if not documents:
+            return []
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            results = await asyncio.wait_for(self._rerank_with_retries(query, documents, top_n), timeout=self.deadline)
+        except Exception as e:
+            self.fallbacks += 1
+            reason = str(e) or type(e).__name__
+            logging.warning(f"Rerank failed ({reason}), using vector order for {len(documents)} candidates")
+            results = vector_order_results(documents, top_n)
+        self.latencies.append(time.perf_counter() - started)
+        return results
+
+    async def _rerank_with_retries(self, query: str, documents: list, top_n: int) -> List[Dict]:
+        session = self._get_session()
+        data = {
+            "model": JINA_RERANK_MODEL,
+            "query": query,
+            "top_n": top_n,
+            "documents": documents
+        }
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with session.post(JINA_RERANK_URL, json=data) as response:
+                        if response.status == 429 or response.status >= 500:
+                            raise RerankError(f"Reranker returned {response.status}")
+                        response.raise_for_status()
+                        return (await response.json())['results']
+                except (RerankError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    delay = 0.1 * (2 ** attempt) + random.uniform(0, 0.1)
+                    logging.warning(f"Rerank attempt {attempt + 1} failed ({str(e) or type(e).__name__}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+
+    async def warm_up(self):
+        """Opens a pooled TLS connection to the reranker host."""
+        async with self._get_session().get("https://api.jina.ai/") as response:
+            await response.read()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stats(self) -> Dict[str, float]:
+        latencies = np.array(self.latencies) * 1000 if self.latencies else None
+        return {
+            "backend": "jina",
+            "calls": self.calls,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies is not None else None,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies is not None else None,
+        }
+
+
+def create_reranker(backend: str = RERANKER_BACKEND) -> Reranker:
+    if backend == "jina":
+        return RerankerClient()
+    if backend == "bm25":
+        return BM25Reranker()
+    if backend == "static":
+        return StaticEmbeddingReranker()
+    raise ValueError(f"Unsupported reranker backend: {backend}")
+
+
+reranker = create_reranker()
+
+
+async def rerank_documents(query: str, documents: list, top_n: int = 3):
+    return await reranker.rerank(query, documents, top_n=top_n)
@@ -1,13 +1,31 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError
 from fastapi import HTTPException, status
+from app.config import S3_MULTIPART_THRESHOLD, S3_MULTIPART_CHUNKSIZE, S3_MAX_CONCURRENCY
 import os
 
 s3_client = boto3.client('s3')
 
+# Files above the threshold are sent as a multipart upload, reading one part at a time from disk.
+transfer_config = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True
+)
+
+def get_s3_key(username, filename):
+    return f"uploads/{username}/{filename}"
+
+def get_filename(username, s3_key):
+    """Inverse of get_s3_key: the filename a document is stored under, as get-doc expects it."""
+    prefix = get_s3_key(username, "")
+    return s3_key[len(prefix):] if s3_key.startswith(prefix) else s3_key.rsplit("/", 1)[-1]
+
 async def upload_to_s3(contents,username, filename, content_type):
     try:
-        s3_key = f"uploads/{username}/{filename}"
+        s3_key = get_s3_key(username, filename)
         s3_client.put_object(
             Bucket=os.getenv("S3_BUCKET_NAME"),
             Key=s3_key,
@@ -17,3 +35,20 @@ async def upload_to_s3(contents,username, filename, content_type):
         return s3_key
     except NoCredentialsError:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="S3 credentials not available")
+
+def upload_file_to_s3(file_path, s3_key, content_type):
+    """
+    Streams a local file to S3 using multipart upload. This call blocks, so run it in a thread
+    when called from async code.
+    """
+    try:
+        s3_client.upload_file(
+            Filename=file_path,
+            Bucket=os.getenv("S3_BUCKET_NAME"),
+            Key=s3_key,
+            ExtraArgs={"ContentType": content_type} if content_type else None,
+            Config=transfer_config
+        )
+        return s3_key
+    except NoCredentialsError:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="S3 credentials not available")
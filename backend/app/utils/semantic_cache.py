@@ -0,0 +1,142 @@
+import hashlib
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_PER_DOCUMENT,
+    SEMANTIC_CACHE_MAX_DOCUMENTS,
+)
+
+# Bucket edges of the best-similarity histogram reported by stats(), for tuning the threshold.
+SIMILARITY_BUCKETS = [-1.0, 0.5, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 1.0001]
+
+
+class _DocumentQuestions:
+    """Ring buffer of one document's answered questions: normalized embeddings, answers, expiry times."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.answers: List[Optional[str]] = [None] * capacity
+        self.count = 0
+        self.next_slot = 0
+
+    def best_match(self, query: np.ndarray, now: float) -> Tuple[int, float]:
+        scores = self.matrix[:self.count] @ query
+        # Expired rows never match; they are overwritten as the ring buffer wraps around.
+        scores[self.expires_at[:self.count] < now] = -1.0
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def add(self, query: np.ndarray, answer: str, expires_at: float):
+        slot = self.next_slot
+        self.matrix[slot] = query
+        self.expires_at[slot] = expires_at
+        self.answers[slot] = answer
+        self.next_slot = (slot + 1) % len(self.answers)
+        self.count = max(self.count, slot + 1)
+
+
+class SemanticCache:
+    """
+    Reuses answers for near-duplicate questions. Each document (per namespace, version and system
+    message) keeps the embeddings of its answered questions in a compact float32 array; a new
+    question is answered from the cache when its cosine similarity to a stored one reaches
+    `threshold`. At most `max_per_document` questions are kept per document (oldest overwritten)
+    and at most `max_documents` documents (least recently used dropped).
+    The best similarity of every lookup is recorded so the threshold can be tuned.
+    `generation` changes on every invalidation, as in AnswerCache.
+    Used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_per_document: int = SEMANTIC_CACHE_MAX_PER_DOCUMENT,
+        max_documents: int = SEMANTIC_CACHE_MAX_DOCUMENTS
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_per_document = max_per_document
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self.similarities: Deque[float] = deque(maxlen=10000)
+        self._documents: "OrderedDict[Tuple[str, str, str, str], _DocumentQuestions]" = OrderedDict()
+
+    @staticmethod
+    def make_key(namespace: str, pdf_id: str, content_hash: Optional[str], system_message: str) -> Tuple[str, str, str, str]:
+        return namespace, pdf_id, content_hash or "", hashlib.sha256(system_message.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, key: Tuple[str, str, str, str], query_vector) -> Optional[Tuple[str, float]]:
+        """Returns (answer, similarity) of the closest stored question at or above the threshold."""
+        questions = self._documents.get(key)
+        if questions is None or questions.count == 0:
+            self.misses += 1
+            return None
+        self._documents.move_to_end(key)
+        row, similarity = questions.best_match(self._normalize(query_vector), time.monotonic())
+        self.similarities.append(similarity)
+        if similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return questions.answers[row], similarity
+
+    def add(self, key: Tuple[str, str, str, str], query_vector, answer: str):
+        query = self._normalize(query_vector)
+        questions = self._documents.get(key)
+        if questions is None or questions.matrix.shape[1] != query.shape[0]:
+            questions = _DocumentQuestions(query.shape[0], self.max_per_document)
+            self._documents[key] = questions
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self.evictions += 1
+        self._documents.move_to_end(key)
+        questions.add(query, answer, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, namespace: str, pdf_id: Optional[str] = None):
+        """Drops the questions of one document, or of every document in a namespace when pdf_id is None."""
+        self.generation += 1
+        for key in [key for key in self._documents if key[0] == namespace and (pdf_id is None or key[1] == pdf_id)]:
+            del self._documents[key]
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        similarities = np.array(self.similarities) if self.similarities else None
+        histogram = None
+        if similarities is not None:
+            counts, _ = np.histogram(similarities, bins=SIMILARITY_BUCKETS)
+            histogram = {
+                f"{max(low, -1.0):.2f}-{min(high, 1.0):.2f}": int(count)
+                for low, high, count in zip(SIMILARITY_BUCKETS, SIMILARITY_BUCKETS[1:], counts)
+            }
+        return {
+            "documents": len(self._documents),
+            "questions": sum(questions.count for questions in self._documents.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "similarity_p50": float(np.percentile(similarities, 50)) if similarities is not None else None,
+            "similarity_p90": float(np.percentile(similarities, 90)) if similarities is not None else None,
+            "similarity_histogram": histogram,
+        }
+
+
+semantic_cache = SemanticCache() if SEMANTIC_CACHE_ENABLED else None
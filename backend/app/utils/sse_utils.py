@@ -0,0 +1,53 @@
+import json
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """One Server-Sent Events message carrying a JSON payload."""
+    message = f"event: {event}\n" if event else ""
+    return f"{message}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def single_chunk(text: str) -> AsyncIterator[str]:
+    """A complete answer (e.g. from a cache) as a one-chunk token stream."""
+    yield text
+
+
+def sse_response(tokens: AsyncIterator[str], on_complete: Optional[Callable[[str], None]] = None,
+                 headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    Streams tokens to the client as they arrive:
+        event: token   data: {"text": ...}      one per delta
+        event: done    data: {"response": ...}  the full answer, once
+        event: error   data: {"error": ...}     if generation fails midway
+    on_complete receives the full answer only when the stream finished. If the client
+    disconnects, Starlette cancels this generator, which closes the upstream completion.
+    """
+    started = time.perf_counter()
+
+    async def events():
+        parts = []
+        try:
+            async for token in tokens:
+                if not parts:
+                    logging.info(f"Time to first token: {(time.perf_counter() - started) * 1000:.0f} ms")
+                parts.append(token)
+                yield format_sse({"text": token}, "token")
+        except Exception as e:
+            logging.error(f"Streaming response error: {str(e)}")
+            yield format_sse({"error": str(e)}, "error")
+            return
+        answer = "".join(parts)
+        if on_complete is not None:
+            on_complete(answer)
+        yield format_sse({"response": answer}, "done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})}
+    )
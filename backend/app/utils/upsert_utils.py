@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import (
+    PINECONE_UPSERT_CONCURRENCY,
+    PINECONE_UPSERT_BATCH_SIZE,
+    PINECONE_UPSERT_MAX_BATCH_BYTES,
+    PINECONE_UPSERT_MAX_RETRIES,
+)
+
+# Dedicated threads for the blocking Pinecone calls, so upserts never queue behind other to_thread work.
+upsert_executor = ThreadPoolExecutor(max_workers=PINECONE_UPSERT_CONCURRENCY, thread_name_prefix="pinecone-upsert")
+
+
+class UpsertError(Exception):
+    """Raised by PineconeUpserter.flush when one or more batches failed after all retries."""
+
+
+def estimate_vector_bytes(vector: Dict[str, Any]) -> int:
+    """Approximate request payload size of one vector: float32 values plus id and metadata."""
+    metadata = vector.get("metadata")
+    metadata_bytes = len(json.dumps(metadata, ensure_ascii=False).encode("utf-8")) if metadata else 0
+    return 4 * len(vector["values"]) + len(vector["id"]) + metadata_bytes + 16
+
+
+class PineconeUpserter:
+    """
+    Upserts vectors into one Pinecone namespace with several batches in flight at once.
+    Batches are closed by vector count or by estimated payload bytes, whichever comes first.
+    add() blocks once max_in_flight batches are outstanding, which gives producers backpressure.
+    Each batch is retried on its own with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        index,
+        namespace: str,
+        max_in_flight: int = PINECONE_UPSERT_CONCURRENCY,
+        max_batch_vectors: int = PINECONE_UPSERT_BATCH_SIZE,
+        max_batch_bytes: int = PINECONE_UPSERT_MAX_BATCH_BYTES,
+        max_retries: int = PINECONE_UPSERT_MAX_RETRIES,
+        on_progress: Optional[Callable[[int], None]] = None
+    ):
+        self.index = index
+        self.namespace = namespace
+        self.max_batch_vectors = max_batch_vectors
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+        self.vectors_upserted = 0
+        self.batches_sent = 0
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_bytes = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._errors: List[Exception] = []
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    async def add(self, vectors: Iterable[Dict[str, Any]]):
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        for vector in vectors:
+            size = estimate_vector_bytes(vector)
+            if self._pending and (
+                len(self._pending) >= self.max_batch_vectors
+                or self._pending_bytes + size > self.max_batch_bytes
+            ):
+                await self._dispatch()
+            self._pending.append(vector)
+            self._pending_bytes += size
+
+    async def flush(self) -> Dict[str, float]:
+        """Sends whatever is buffered and waits for every in-flight batch."""
+        if self._pending:
+            await self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._finished_at = time.perf_counter()
+        stats = self.stats()
+        logging.info(
+            f"Upserted {stats['vectors']} vectors to namespace '{self.namespace}' in {stats['batches']} batches, "
+            f"{stats['vectors_per_sec']:.1f} vectors/sec ({stats['retries']} retries)"
+        )
+        if self._errors:
+            raise UpsertError(f"{len(self._errors)} upsert batches failed: {self._errors[0]}")
+        return stats
+
+    def stats(self) -> Dict[str, float]:
+        end = self._finished_at or time.perf_counter()
+        elapsed = end - self._started_at if self._started_at is not None else 0.0
+        return {
+            "vectors": self.vectors_upserted,
+            "batches": self.batches_sent,
+            "retries": self.retries,
+            "failed_batches": len(self._errors),
+            "seconds": round(elapsed, 3),
+            "vectors_per_sec": self.vectors_upserted / elapsed if elapsed > 0 else 0.0,
+        }
+
+    async def _dispatch(self):
+        batch = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await loop.run_in_executor(
+                        upsert_executor,
+                        lambda: self.index.upsert(vectors=batch, namespace=self.namespace)
+                    )
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logging.error(f"Upsert of {len(batch)} vectors failed after {attempt + 1} attempts: {str(e)}")
+                        self._errors.append(e)
+                        return
+                    self.retries += 1
+                    delay = 0.5 * (2 ** attempt) + random.uniform(0, 0.5)
+                    logging.warning(f"Upsert batch failed ({str(e)}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+            self.vectors_upserted += len(batch)
+            self.batches_sent += 1
+            if self.on_progress is not None:
+                self.on_progress(len(batch))
+        finally:
+            self._semaphore.release()
+
+
+async def upsert_vectors(index, vectors: Iterable[Dict[str, Any]], namespace: str,
+                         on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, float]:
+    """Convenience wrapper: upserts an iterable of vectors concurrently and returns throughput stats."""
+    upserter = PineconeUpserter(index, namespace, on_progress=on_progress)
+    await upserter.add(vectors)
+    return await upserter.flush()
+
+
+async def update_vector_metadata(index, updates: List[Tuple[str, Dict[str, Any]]], namespace: str,
+                                 batch_size: int = 1000) -> Dict[str, float]:
+    """
+    Applies (vector_id, metadata) partial updates. Pinecone updates one vector per call, so instead
+    the vectors are fetched in batches of batch_size and re-upserted with the merged metadata
+    through a PineconeUpserter (same batching, in-flight limit and retries as ingestion):
+    about 2N/1000 round trips rather than N.
+    """
+    if not updates:
+        return {}
+    loop = asyncio.get_running_loop()
+    ids = [vector_id for vector_id, _ in updates]
+    responses = await asyncio.gather(*[
+        loop.run_in_executor(
+            upsert_executor,
+            lambda batch=ids[start:start + batch_size]: index.fetch(ids=batch, namespace=namespace)
+        )
+        for start in range(0, len(ids), batch_size)
+    ])
+    fetched = {}
+    for response in responses:
+        fetched.update(response.vectors)
+    upserter = PineconeUpserter(index, namespace)
+    await upserter.add(
+        {
+            "id": vector_id,
+            "values": fetched[vector_id].values,
+            "metadata": {**(fetched[vector_id].metadata or {}), **metadata}
+        }
+        for vector_id, metadata in updates
+        if vector_id in fetched
+    )
+    return await upserter.flush()
+
+
+async def filter_owned_vectors(index, ids: List[str], namespace: str, pdf_id: str, batch_size: int = 1000) -> List[str]:
+    """
+    Keeps the ids whose vector still belongs to pdf_id. Vectors from before document-scoped ids
+    could be shared with (and re-labelled by) another upload of the same bytes; those must not be deleted.
+    """
+    loop = asyncio.get_running_loop()
+    responses = await asyncio.gather(*[
+        loop.run_in_executor(
+            upsert_executor,
+            lambda batch=ids[start:start + batch_size]: index.fetch(ids=batch, namespace=namespace)
+        )
+        for start in range(0, len(ids), batch_size)
+    ])
+    owned = []
+    for response in responses:
+        for vector_id, vector in response.vectors.items():
+            if (vector.metadata or {}).get("pdf_id") == pdf_id:
+                owned.append(vector_id)
+    return owned
+
+
+async def list_vector_ids(index, prefix: str, namespace: str) -> List[str]:
+    """All vector ids starting with prefix (Pinecone's paginated list, collected on the upsert threads)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        upsert_executor,
+        lambda: [vector_id for page in index.list(prefix=prefix, namespace=namespace) for vector_id in page]
+    )
+
+
+async def delete_vectors(index, ids: List[str], namespace: str, batch_size: int = 1000):
+    """Deletes vectors by id in concurrent batches."""
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[
+        loop.run_in_executor(
+            upsert_executor,
+            lambda batch=ids[start:start + batch_size]: index.delete(ids=batch, namespace=namespace)
+        )
+        for start in range(0, len(ids), batch_size)
+    ])
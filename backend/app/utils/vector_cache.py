@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import VECTOR_CACHE_ENABLED, VECTOR_CACHE_MAX_BYTES
+
+# Pinecone caps the number of ids per fetch request.
+FETCH_BATCH_SIZE = 1000
+
+
+class CachedDocument:
+    """
+    All chunk vectors of one document as a contiguous float32 matrix with L2-normalized rows,
+    plus the chunk texts in the same order. content_hash ties the entry to one indexed version.
+    """
+
+    def __init__(self, content_hash: str, ids: List[str], texts: List[str], vectors):
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.maximum(norms, 1e-12)
+        self.content_hash = content_hash
+        self.ids = ids
+        self.texts = texts
+        self.rows = {vector_id: row for row, vector_id in enumerate(ids)}
+        self.nbytes = self.matrix.nbytes + sum(len(text) for text in texts) + sum(len(vector_id) for vector_id in ids)
+
+    def search(self, query_vector, top_k: int) -> List[Tuple[int, float]]:
+        """Cosine top-k as (row, score), best first."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.matrix @ query
+        if top_k < len(scores):
+            rows = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows])]
+        return [(int(row), float(scores[row])) for row in rows]
+
+
+DocumentLoader = Callable[[], Awaitable[Optional[CachedDocument]]]
+
+
+class VectorCache:
+    """
+    LRU cache of CachedDocument entries keyed by (namespace, pdf_id), bounded by total bytes.
+    Lookups pass the document's current content hash, so an entry from an older version of the
+    document is never served. Concurrent misses for the same document share one load.
+    Used from the event loop only.
+    """
+
+    def __init__(self, max_bytes: int = VECTOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_failures = 0
+        self.load_seconds = 0.0
+        self._entries: "OrderedDict[Tuple[str, str], CachedDocument]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], Tuple[str, asyncio.Task]] = {}
+        self._generation = 0
+
+    async def get_or_load(self, namespace: str, pdf_id: str, content_hash: str,
+                          loader: DocumentLoader) -> Optional[CachedDocument]:
+        """Returns the cached document, loading it on a miss; None when it cannot be loaded."""
+        key = (namespace, pdf_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry.content_hash == content_hash:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        loading = self._loading.get(key)
+        if loading is None or loading[0] != content_hash:
+            task = asyncio.create_task(self._load(key, content_hash, loader))
+            self._loading[key] = (content_hash, task)
+            loading = (content_hash, task)
+        # Shielded so a cancelled request does not abort a load other requests are waiting on.
+        return await asyncio.shield(loading[1])
+
+    async def _load(self, key: Tuple[str, str], content_hash: str, loader: DocumentLoader) -> Optional[CachedDocument]:
+        generation = self._generation
+        started = time.perf_counter()
+        try:
+            entry = await loader()
+        except Exception as e:
+            self.load_failures += 1
+            logging.error(f"Loading vectors of {key[1]} into the vector cache failed: {str(e)}")
+            return None
+        finally:
+            self.load_seconds += time.perf_counter() - started
+            if self._loading.get(key, (None, None))[1] is asyncio.current_task():
+                del self._loading[key]
+        if entry is None:
+            return None
+        # Skip storing if the document was invalidated while it was loading.
+        if generation == self._generation and entry.content_hash == content_hash:
+            self._put(key, entry)
+        return entry
+
+    def _put(self, key: Tuple[str, str], entry: CachedDocument):
+        self._discard(key)
+        if entry.nbytes > self.max_bytes:
+            return
+        while self._entries and self.bytes + entry.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        self._entries[key] = entry
+        self.bytes += entry.nbytes
+
+    def _discard(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+
+    def invalidate(self, namespace: str, pdf_id: Optional[str] = None):
+        """Drops one document, or every document of a namespace when pdf_id is None."""
+        self._generation += 1
+        for key in [key for key in self._entries if key[0] == namespace and (pdf_id is None or key[1] == pdf_id)]:
+            self._discard(key)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "documents": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "load_failures": self.load_failures,
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+
+async def load_document_vectors(index, namespace: str, content_hash: str, vector_ids: List[str]) -> Optional[CachedDocument]:
+    """
+    Fetches a document's vectors and chunk texts from Pinecone by id, in concurrent batches.
+    Returns None if any vector is missing (e.g. not yet visible after an upsert), so the caller
+    falls back to querying Pinecone rather than caching a partial document.
+    """
+    if not vector_ids:
+        return None
+    responses = await asyncio.gather(*[
+        asyncio.to_thread(index.fetch, ids=vector_ids[start:start + FETCH_BATCH_SIZE], namespace=namespace)
+        for start in range(0, len(vector_ids), FETCH_BATCH_SIZE)
+    ])
+    fetched = {}
+    for response in responses:
+        fetched.update(response.vectors)
+    if any(vector_id not in fetched for vector_id in vector_ids):
+        logging.warning(f"{len(vector_ids) - len(fetched)} vectors missing from fetch, not caching document")
+        return None
+    vectors = [fetched[vector_id] for vector_id in vector_ids]
+    return CachedDocument(
+        content_hash,
+        list(vector_ids),
+        [vector.metadata["text"] for vector in vectors],
+        [vector.values for vector in vectors]
+    )
+
+
+vector_cache = VectorCache() if VECTOR_CACHE_ENABLED else None
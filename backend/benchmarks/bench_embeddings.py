@@ -0,0 +1,114 @@
+"""
+Compares the local static-model embedding backend with OpenAIEmbeddings.
+
+Reports document throughput, per-query latency (p50/p99), recall@k of the local nearest neighbours
+against the OpenAI neighbours, and, for generated queries, how often each backend ranks the
+source passage in its top k.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_embeddings --corpus passages.txt --k 5
+    python -m benchmarks.bench_embeddings --pdf manual.pdf --queries questions.txt
+The corpus file holds one passage per line. Without --queries, the first sentence of a sample of
+passages is used as the query. The OpenAI side is skipped when OPENAI_API_KEY is not set.
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+from model2vec import StaticModel
+
+from app.config import LOCAL_EMBEDDING_MODEL, OPENAI_API_KEY
+from app.utils.local_embeddings import LocalEmbeddings
+
+
+def load_passages(args):
+    if args.pdf:
+        import pymupdf4llm
+        from chonkie import SemanticChunker
+        chunker = SemanticChunker(embedding_model="minishlab/potion-base-8M", threshold=0.5, chunk_size=512, min_sentences=1)
+        return [chunk.text for chunk in chunker.chunk(pymupdf4llm.to_markdown(args.pdf, show_progress=False))]
+    with open(args.corpus, encoding="utf-8") as corpus:
+        return [line.strip() for line in corpus if line.strip()]
+
+
+def make_queries(passages, count, seed):
+    rng = random.Random(seed)
+    sources = rng.sample(range(len(passages)), min(count, len(passages)))
+    return [passages[idx].split(". ")[0][:200] for idx in sources], sources
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(doc_matrix, query_matrix, k):
+    scores = query_matrix @ doc_matrix.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_backend(name, embedder, passages, queries):
+    start = time.perf_counter()
+    docs = normalize(embedder.embed_documents(passages))
+    doc_seconds = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embedder.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:>8}: {len(passages) / doc_seconds:10.1f} docs/sec  "
+        f"query p50 {np.percentile(latencies, 50):8.2f} ms  p99 {np.percentile(latencies, 99):8.2f} ms"
+    )
+    return docs, normalize(query_vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="text file with one passage per line")
+    source.add_argument("--pdf", help="PDF to parse and chunk into passages")
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--num-queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    passages = load_passages(args)
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as query_file:
+            queries, sources = [line.strip() for line in query_file if line.strip()], None
+    else:
+        queries, sources = make_queries(passages, args.num_queries, args.seed)
+    print(f"{len(passages)} passages, {len(queries)} queries, k={args.k}")
+
+    local = LocalEmbeddings(StaticModel.from_pretrained(LOCAL_EMBEDDING_MODEL), model_name=LOCAL_EMBEDDING_MODEL)
+    local_docs, local_queries = run_backend("local", local, passages, queries)
+    local_top = top_k(local_docs, local_queries, args.k)
+
+    if sources is not None:
+        hit_rate = np.mean([source in row for source, row in zip(sources, local_top)])
+        print(f"   local: source passage in top {args.k}: {hit_rate:.2%}")
+
+    if not OPENAI_API_KEY:
+        print("  openai: skipped (OPENAI_API_KEY not set)")
+        return
+
+    from langchain_openai import OpenAIEmbeddings
+    openai_docs, openai_queries = run_backend("openai", OpenAIEmbeddings(api_key=OPENAI_API_KEY), passages, queries)
+    openai_top = top_k(openai_docs, openai_queries, args.k)
+    if sources is not None:
+        hit_rate = np.mean([source in row for source, row in zip(sources, openai_top)])
+        print(f"  openai: source passage in top {args.k}: {hit_rate:.2%}")
+
+    recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(local_top, openai_top)])
+    print(f"local recall@{args.k} against OpenAI neighbours: {recall:.2%}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    main()
@@ -0,0 +1,109 @@
+"""
+Measures how many embedding batches the ingestion pipeline keeps in flight, and what that does to
+end-to-end chunk throughput, for different values of embed_concurrency (EMBEDDING_CONCURRENCY).
+
+The embedding API and Pinecone are simulated with fixed latencies, so the numbers isolate the
+pipeline's scheduling from network variance; chunking uses the real chunker.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ingestion --concurrency 1 2 4 8 --segments 40 --latency 0.3
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.embedding_utils import get_chunker
+from app.utils.ingestion_pipeline import iter_texts, run_ingestion_pipeline
+from app.utils.upsert_utils import PineconeUpserter
+
+PARAGRAPH = (
+    "The quarterly report covers revenue, operating costs and the outlook for the next period. "
+    "Revenue grew in every region, driven by new subscriptions and higher retention. "
+    "Operating costs rose more slowly than revenue, mostly from hiring in support and engineering. "
+)
+
+
+class SimulatedEmbeddings(Embeddings):
+    """Answers every batch after a fixed latency and records how many batches overlap."""
+
+    def __init__(self, latency: float, dim: int):
+        self.latency = latency
+        self.dim = dim
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return np.random.rand(len(texts), self.dim).astype(np.float32).tolist()
+
+
+class SimulatedIndex:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def upsert(self, vectors, namespace):
+        time.sleep(self.latency)
+
+
+async def run(segments: List[str], concurrency: int, batch_size: int, latency: float, upsert_latency: float, dim: int):
+    embeddings = SimulatedEmbeddings(latency, dim)
+    upserter = PineconeUpserter(SimulatedIndex(upsert_latency), namespace="bench")
+    start = time.perf_counter()
+    manifest = await run_ingestion_pipeline(
+        iter_texts(*segments),
+        build_vector=lambda idx, text, vector: {"id": f"chunk-{idx}", "values": vector, "metadata": {"text": text}},
+        upserter=upserter,
+        embed_batch_size=batch_size,
+        embed_concurrency=concurrency,
+        embeddings=embeddings
+    )
+    return len(manifest), time.perf_counter() - start, embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--segments", type=int, default=40, help="text segments (pages) fed to the pipeline")
+    parser.add_argument("--paragraphs", type=int, default=12, help="paragraphs per segment")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated seconds per embedding request")
+    parser.add_argument("--upsert-latency", type=float, default=0.05, help="simulated seconds per Pinecone upsert")
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    segments = [f"Page {page + 1}.\n\n" + "\n\n".join([PARAGRAPH] * args.paragraphs) for page in range(args.segments)]
+    # Load the chunker model before timing anything.
+    get_chunker().chunk(segments[0])
+
+    baseline = None
+    for concurrency in args.concurrency:
+        chunks, seconds, embeddings = asyncio.run(
+            run(segments, concurrency, args.batch_size, args.latency, args.upsert_latency, args.dim)
+        )
+        baseline = baseline or seconds
+        print(
+            f"embed_concurrency={concurrency:2d}: {chunks} chunks in {embeddings.requests} batches, "
+            f"peak {embeddings.peak_in_flight} in flight, {seconds:6.2f} s, "
+            f"{chunks / seconds:8.1f} chunks/sec ({baseline / seconds:4.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures page-parallel PDF parsing throughput (pages/sec) for different process pool sizes.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pdf_parse --pdf path/to/file.pdf --workers 1 2 4 8
+Without --pdf a synthetic text-heavy document is generated.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import pymupdf
+
+from app.utils.pdf_utils import create_parse_executor, get_page_count, parse_pdf
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt "
+    "ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco. "
+)
+
+
+def make_synthetic_pdf(path: str, pages: int):
+    doc = pymupdf.open()
+    for pno in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Section {pno + 1}", fontsize=18)
+        page.insert_textbox(pymupdf.Rect(72, 90, 540, 760), LOREM * 12, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+async def run(pdf_path: str, workers: int, batch_size: int) -> float:
+    executor = create_parse_executor(workers)
+    try:
+        # Warm the pool so process start-up is not counted.
+        await asyncio.gather(*[
+            asyncio.get_running_loop().run_in_executor(executor, get_page_count, pdf_path)
+            for _ in range(workers)
+        ])
+        start = time.perf_counter()
+        await parse_pdf(pdf_path, executor=executor, batch_size=batch_size, prefetch=2 * workers)
+        return time.perf_counter() - start
+    finally:
+        executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to parse (defaults to a generated document)")
+    parser.add_argument("--pages", type=int, default=120, help="pages in the generated document")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    pdf_path = args.pdf
+    if pdf_path is None:
+        pdf_path = os.path.join(tempfile.mkdtemp(), "synthetic.pdf")
+        make_synthetic_pdf(pdf_path, args.pages)
+    page_count = get_page_count(pdf_path)
+
+    # Single-threaded baseline: what upload_doc used to do on the event loop.
+    import pymupdf4llm
+    start = time.perf_counter()
+    pymupdf4llm.to_markdown(pdf_path, show_progress=False)
+    baseline = time.perf_counter() - start
+    print(f"{'workers':>8} {'seconds':>9} {'pages/sec':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {baseline:9.2f} {page_count / baseline:10.1f} {1.0:8.2f}")
+
+    for workers in sorted(set(args.workers)):
+        elapsed = asyncio.run(run(pdf_path, workers, args.batch_size))
+        print(f"{workers:>8} {elapsed:9.2f} {page_count / elapsed:10.1f} {baseline / elapsed:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
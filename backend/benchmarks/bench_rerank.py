@@ -0,0 +1,106 @@
+"""
+Compares the in-process rerankers (BM25, static embeddings) with the Jina API on latency and ranking quality.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_rerank --corpus passages.txt --candidates 10
+    python -m benchmarks.bench_rerank --cases cases.jsonl
+--corpus holds one passage per line; each case takes the first sentence of a passage as the query
+and mixes that passage (the relevant one) with random others. --cases is JSONL with
+{"query": ..., "documents": [...], "relevant": [indices]} per line ("relevant" optional).
+Quality is reported as MRR and hit@1 against the relevant passages, and as top-1 agreement and
+overlap@top_n with Jina's ranking. Jina is skipped when JINA_API_KEY is not set.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from app.config import JINA_API_KEY
+from app.utils.rerank_utils import BM25Reranker, RerankerClient, StaticEmbeddingReranker
+
+
+def load_cases(args):
+    if args.cases:
+        with open(args.cases, encoding="utf-8") as cases_file:
+            return [json.loads(line) for line in cases_file if line.strip()]
+    with open(args.corpus, encoding="utf-8") as corpus:
+        passages = [line.strip() for line in corpus if line.strip()]
+    rng = random.Random(args.seed)
+    cases = []
+    for source in rng.sample(range(len(passages)), min(args.num_cases, len(passages))):
+        others = rng.sample([idx for idx in range(len(passages)) if idx != source], min(args.candidates - 1, len(passages) - 1))
+        candidates = others + [source]
+        rng.shuffle(candidates)
+        cases.append({
+            "query": passages[source].split(". ")[0][:200],
+            "documents": [passages[idx] for idx in candidates],
+            "relevant": [candidates.index(source)],
+        })
+    return cases
+
+
+async def run(reranker, cases, top_n):
+    latencies = []
+    rankings = []
+    for case in cases:
+        started = time.perf_counter()
+        results = await reranker.rerank(case["query"], case["documents"], top_n=len(case["documents"]))
+        latencies.append((time.perf_counter() - started) * 1000)
+        rankings.append([result["index"] for result in results])
+    return latencies, rankings
+
+
+def mrr(rankings, cases):
+    scores = []
+    for ranking, case in zip(rankings, cases):
+        relevant = set(case.get("relevant") or [])
+        if not relevant:
+            continue
+        rank = next((pos for pos, idx in enumerate(ranking, 1) if idx in relevant), None)
+        scores.append(1.0 / rank if rank else 0.0)
+    return (float(np.mean(scores)), float(np.mean([score == 1.0 for score in scores]))) if scores else (None, None)
+
+
+def agreement(rankings, reference, top_n):
+    top1 = np.mean([ranking[:1] == ref[:1] for ranking, ref in zip(rankings, reference)])
+    overlap = np.mean([len(set(ranking[:top_n]) & set(ref[:top_n])) / top_n for ranking, ref in zip(rankings, reference)])
+    return top1, overlap
+
+
+async def main(args):
+    cases = load_cases(args)
+    print(f"{len(cases)} cases, {np.mean([len(case['documents']) for case in cases]):.1f} candidates each")
+    rerankers = {"bm25": BM25Reranker(), "static": StaticEmbeddingReranker()}
+    if JINA_API_KEY:
+        rerankers["jina"] = RerankerClient(deadline=30.0)
+    else:
+        print("jina: skipped (JINA_API_KEY not set)")
+
+    rankings = {}
+    for name, reranker in rerankers.items():
+        await reranker.warm_up()
+        latencies, rankings[name] = await run(reranker, cases, args.top_n)
+        mean_rr, hit1 = mrr(rankings[name], cases)
+        quality = f"  MRR {mean_rr:.3f}  hit@1 {hit1:.2%}" if mean_rr is not None else ""
+        print(f"{name:>6}: p50 {np.percentile(latencies, 50):8.2f} ms  p99 {np.percentile(latencies, 99):8.2f} ms{quality}")
+        await reranker.close()
+
+    if "jina" in rankings:
+        for name in ("bm25", "static"):
+            top1, overlap = agreement(rankings[name], rankings["jina"], args.top_n)
+            print(f"{name:>6} vs jina: top-1 agreement {top1:.2%}, overlap@{args.top_n} {overlap:.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", help="text file with one passage per line")
+    source.add_argument("--cases", help="JSONL file of rerank cases")
+    parser.add_argument("--num-cases", type=int, default=100)
+    parser.add_argument("--candidates", type=int, default=10)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""
+Measures cold-start time of `import app.main` in fresh interpreters and appends the result to a
+JSONL history file, so startup regressions show up across commits.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --history benchmarks/startup_history.jsonl
+Each run is a new process, so nothing is shared between runs apart from the OS file cache.
+The slowest modules of the last run (from -X importtime) are reported too. Placeholder values
+are filled in for credentials the app requires at import, so no real keys or network are needed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(BACKEND_DIR, "benchmarks", "startup_history.jsonl")
+
+PLACEHOLDER_ENV = {
+    "DATABASE_CONNECTION": "sqlite:///:memory:",
+    "GROQ_API_KEY": "placeholder",
+    "OPENAI_API_KEY": "placeholder",
+    "PINECONE_API_KEY": "placeholder",
+}
+
+TIMED_IMPORT = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+
+def child_env():
+    env = dict(os.environ)
+    for key, value in PLACEHOLDER_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+
+def time_import() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", TIMED_IMPORT], cwd=BACKEND_DIR, env=child_env(),
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_modules(top: int):
+    """Top modules by cumulative import time (microseconds), from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR, env=child_env(),
+        capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative)))
+    modules.sort(key=lambda module: module[1], reverse=True)
+    # app.main itself is the total; skip it.
+    return [module for module in modules if module[0] != "app.main"][:top]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_entry(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as history:
+        lines = [line for line in history if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to report")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--no-record", action="store_true", help="do not append to the history file")
+    args = parser.parse_args()
+
+    times = [time_import() for _ in range(args.runs)]
+    for run, seconds in enumerate(times, 1):
+        print(f"run {run}: {seconds * 1000:8.1f} ms")
+    median = statistics.median(times)
+    print(f"median {median * 1000:.1f} ms, min {min(times) * 1000:.1f} ms, max {max(times) * 1000:.1f} ms")
+
+    modules = slowest_modules(args.top)
+    print("slowest imports (cumulative):")
+    for name, micros in modules:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    previous = last_entry(args.history)
+    if previous is not None:
+        change = (median - previous["median_s"]) / previous["median_s"]
+        print(f"previous median {previous['median_s'] * 1000:.1f} ms ({previous.get('commit')}), change {change:+.1%}")
+
+    if not args.no_record:
+        entry = {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "median_s": round(median, 4),
+            "min_s": round(min(times), 4),
+            "max_s": round(max(times), 4),
+            "slowest_modules": [{"module": name, "ms": round(micros / 1000, 1)} for name, micros in modules],
+        }
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(entry) + "\n")
+        print(f"recorded in {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compares top-k retrieval latency (p50/p99) of the in-memory vector cache with a filtered Pinecone query.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_vector_cache --chunks 500 --dim 1536
+    python -m benchmarks.bench_vector_cache --namespace alice --pdf-id uploads/alice/report.pdf
+Without --namespace/--pdf-id only the cache side runs, on a synthetic document. With them, the
+document is loaded from Pinecone through its chunk manifest (needs the database and Pinecone
+credentials), and both sides answer the same queries: perturbed copies of the document's own vectors.
+Reports how many of Pinecone's top-k ids the cache also returns.
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.utils.vector_cache import CachedDocument, load_document_vectors
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def make_queries(document: CachedDocument, count: int, rng) -> np.ndarray:
+    rows = rng.integers(0, len(document.ids), size=count)
+    noise = rng.normal(scale=0.02, size=(count, document.matrix.shape[1])).astype(np.float32)
+    return document.matrix[rows] + noise
+
+
+def bench_cache(document: CachedDocument, queries: np.ndarray, top_k: int):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        hits = document.search(query, top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({document.ids[row] for row, _ in hits})
+    return latencies, results
+
+
+def bench_pinecone(index, namespace: str, pdf_id: str, queries: np.ndarray, top_k: int):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        response = index.query(
+            vector=query.tolist(), top_k=top_k, include_metadata=True, namespace=namespace, filter={"pdf_id": pdf_id}
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({match.id for match in response.matches})
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500, help="synthetic document size")
+    parser.add_argument("--dim", type=int, default=1536, help="synthetic vector dimension")
+    parser.add_argument("--namespace")
+    parser.add_argument("--pdf-id")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    index = None
+    if args.namespace and args.pdf_id:
+        from app.dependencies.document_dependencies import get_chunk_manifest
+        from app.utils.embedding_utils import get_index
+        index = get_index()
+        vector_ids = [chunk.vector_id for chunk in get_chunk_manifest(args.namespace, args.pdf_id)]
+        started = time.perf_counter()
+        document = asyncio.run(load_document_vectors(index, args.namespace, "benchmark", vector_ids))
+        if document is None:
+            raise SystemExit(f"Could not load {args.pdf_id}: no chunk manifest or vectors missing from Pinecone")
+        print(f"loaded {len(vector_ids)} vectors in {(time.perf_counter() - started) * 1000:.0f} ms")
+    else:
+        vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+        document = CachedDocument("benchmark", [f"chunk-{idx}" for idx in range(args.chunks)],
+                                  [""] * args.chunks, vectors)
+    print(f"{len(document.ids)} chunks x {document.matrix.shape[1]} dims, {document.nbytes / 1024:.0f} KiB cached")
+
+    queries = make_queries(document, args.queries, rng)
+    cache_latencies, cache_results = bench_cache(document, queries, args.top_k)
+    p50, p99 = percentiles(cache_latencies)
+    print(f"   cache: p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+
+    if index is not None:
+        pinecone_latencies, pinecone_results = bench_pinecone(index, args.namespace, args.pdf_id, queries, args.top_k)
+        p50, p99 = percentiles(pinecone_latencies)
+        print(f"pinecone: p50 {p50:8.3f} ms  p99 {p99:8.3f} ms")
+        overlap = np.mean([len(a & b) / max(len(b), 1) for a, b in zip(cache_results, pinecone_results)])
+        print(f"top-{args.top_k} agreement with Pinecone: {overlap:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,59 @@ import axios from "axios";
 import { BACKEND_URL } from "@/utils/constant";
 import { useAuth } from "@/contexts/AuthContext";
 
+// Status of a background ingestion job, as returned by /upload-status/{job_id}.
+interface UploadStatus {
+  job_id: string;
+  stage: string;
+  chunks_total: number;
+  chunks_upserted: number;
+  chunks_reused: number;
+  error: string | null;
+  result: { s3_key?: string; filename?: string; deduplicated?: boolean };
+}
+
+const POLL_INTERVAL_MS = 1500;
+const POLL_TIMEOUT_MS = 15 * 60 * 1000;
+const MAX_POLL_ERRORS = 5;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Polls the ingestion job until it is completed or failed; the document can only be queried once it is completed.
+const waitForIndexing = async (
+  jobId: string,
+  onUpdate: (status: UploadStatus) => void
+): Promise<UploadStatus> => {
+  const deadline = Date.now() + POLL_TIMEOUT_MS;
+  let errors = 0;
+  while (Date.now() < deadline) {
+    try {
+      const { data } = await axios.get<UploadStatus>(`${BACKEND_URL}/upload-status/${jobId}`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem("Token")}` },
+      });
+      errors = 0;
+      onUpdate(data);
+      if (data.stage === "completed" || data.stage === "failed") {
+        return data;
+      }
+    } catch (error) {
+      errors += 1;
+      if (errors >= MAX_POLL_ERRORS) {
+        throw error;
+      }
+    }
+    await sleep(POLL_INTERVAL_MS);
+  }
+  throw new Error("Timed out waiting for the document to be processed");
+};
+
 const Page = () => {
   const { toast } = useToast();
   const [isDragOver, setIsDragOver] = useState<boolean>(false);
   const [isUploading, setIsUploading] = useState<boolean>(false);
   const [uploadProgress, setUploadProgress] = useState<number>(0);
+  const [isIndexing, setIsIndexing] = useState<boolean>(false);
+  const [indexingStage, setIndexingStage] = useState<string>("queued");
+  const [indexingProgress, setIndexingProgress] = useState<number>(0);
   const [isPending, startTransition] = useTransition();
   const router = useRouter();
   const { isLoggedIn } = useAuth();
@@ -68,30 +116,60 @@ const Page = () => {
       });
   
       setIsUploading(false);
+
+      // The document is indexed in the background; wait for it before opening the chat.
+      setIndexingStage("queued");
+      setIndexingProgress(0);
+      setIsIndexing(true);
+      const job = await waitForIndexing(response.data.job_id, (status) => {
+        setIndexingStage(status.stage);
+        if (status.chunks_total) {
+          setIndexingProgress(Math.round((status.chunks_upserted + status.chunks_reused) * 100 / status.chunks_total));
+        }
+      });
+      setIsIndexing(false);
+
+      if (job.stage === "failed") {
+        toast({
+          title: "Processing failed",
+          description: job.error || `File ${acceptedFiles[0].name} could not be processed`,
+          className: "text-white",
+          variant: "destructive",
+        });
+        return;
+      }
+
+      // A duplicate of an earlier upload is served from that copy, under its original name.
+      const fileName = job.result.filename || response.data.filename || acceptedFiles[0].name;
+      const s3Key = job.result.s3_key || response.data.s3_key;
       toast({
         title: "PDF uploaded successfully",
-        description: `File ${acceptedFiles[0].name} was uploaded successfully`,
+        description:
+          fileName === acceptedFiles[0].name
+            ? `File ${fileName} was uploaded successfully`
+            : `File ${acceptedFiles[0].name} was already uploaded as ${fileName}`,
         variant: "default",
       });
   
       // Save document info to localStorage
-      localStorage.setItem("pdfFileName", acceptedFiles[0].name);
+      localStorage.setItem("pdfFileName", fileName);
       
-      if (response.data && response.data.s3_key) {
-        // If you want to store the full s3_key
-        localStorage.setItem("pdfS3Key", response.data.s3_key);
+      if (s3Key) {
+        localStorage.setItem("pdfS3Key", s3Key);
       }
   
-      // Navigate to chat page after successful upload
+      // Navigate to chat page once the document is indexed
       startTransition(() => {
         router.push("/pdf/chat");
       });
     } catch (error) {
       console.error("Upload error:", error);
       setIsUploading(false);
+      setIsIndexing(false);
       toast({
         title: "Upload error",
-        description: "An error occurred during upload",
+        description:
+          (axios.isAxiosError(error) && error.response?.data?.error) || "An error occurred during upload",
         className: "text-white",
         variant: "destructive",
       });
@@ -110,6 +188,7 @@ const Page = () => {
         <Dropzone
           onDropRejected={onDropRejected}
           onDropAccepted={onDropAccepted}
+          disabled={isUploading || isIndexing}
           accept={{
             "application/pdf": [".pdf"],
           }}
@@ -124,7 +203,7 @@ const Page = () => {
               <input {...getInputProps()} />
               {isDragOver ? (
                 <MousePointerSquareDashed className="text-blue-900/50 w-16 h-16 mb-2" />
-              ) : isUploading || isPending ? (
+              ) : isUploading || isIndexing || isPending ? (
                 <Loader className="animate-spin h-6 w-6 text-zinc-500 mb-2" />
               ) : (
                 <Image className="w-16 h-16 mb-2" />
@@ -138,6 +217,14 @@ const Page = () => {
                       className="mt-2 w-40 h-2 bg-gray-300"
                     />
                   </div>
+                ) : isIndexing ? (
+                  <div className="flex flex-col items-center">
+                    <p>Processing ({indexingStage})...</p>
+                    <Progress
+                      value={indexingProgress}
+                      className="mt-2 w-40 h-2 bg-gray-300"
+                    />
+                  </div>
                 ) : isPending ? (
                   <div className="flex flex-col items-center">
                     <p>Processing...</p>
@@ -153,7 +240,7 @@ const Page = () => {
                   </p>
                 )}
               </div>
-              {isPending ? null : (
+              {isPending || isIndexing ? null : (
                 <p className="text-xs text-zinc-500">Only PDF files supported</p>
               )}
             </div>